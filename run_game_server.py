@@ -9,8 +9,7 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from server.game_server.game_server import main
-import asyncio
+from server.game_server.game_server import run
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -19,6 +18,6 @@ if __name__ == '__main__':
     print()
 
     try:
-        asyncio.run(main())
+        run()
     except KeyboardInterrupt:
         print("\nGame server stopped.")
@@ -5,15 +5,16 @@ Handles all database operations with SQLAlchemy
 
 import os
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
-from sqlalchemy import create_engine, and_, or_
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy import create_engine, and_, or_, insert, select, update, delete, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, scoped_session
 from contextlib import contextmanager
 
 from server.database.models import (
     Base, Account, Session, Character, InventoryItem, Equipment,
     CharacterSkill, ActiveBuff, ReincarnationHistory, TerritoryControl,
-    NPCInstance, GameLog
+    Guild, GuildMembership, NPCInstance, GameLog
 )
 from shared.constants import DB_PATH, SESSION_EXPIRY, GameMode
 from shared.utils import hash_password, verify_password, generate_session_token, Logger
@@ -286,6 +287,20 @@ class DatabaseManager:
                 if online:
                     character.last_played = datetime.utcnow()
 
+    def save_character_snapshots(self, snapshots: List[Dict[str, Any]]):
+        """
+        Save position, stats and online status for many characters at once
+
+        Each snapshot is a dict keyed by Character column names and must
+        include 'id'. All rows are written with a single executemany UPDATE
+        in one transaction.
+        """
+        if not snapshots:
+            return
+
+        with self.get_session() as session:
+            session.execute(update(Character), snapshots)
+
     # ========================================================================
     # INVENTORY OPERATIONS
     # ========================================================================
@@ -403,6 +418,77 @@ class DatabaseManager:
             territory.captured_at = datetime.utcnow() if character_id else None
             territory.capture_points = 0
 
+    def set_territory_controls_bulk(self, rows: List[Dict[str, Any]]):
+        """
+        Upsert many territory control rows in one transaction
+
+        Each row is a dict keyed by TerritoryControl column names and must
+        include 'territory_id'.
+        """
+        if not rows:
+            return
+
+        with self.get_session() as session:
+            stmt = sqlite_insert(TerritoryControl)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[TerritoryControl.territory_id],
+                set_={key: stmt.excluded[key] for key in rows[0] if key != 'territory_id'}
+            )
+            session.execute(stmt, rows)
+
+    # ========================================================================
+    # GUILD OPERATIONS
+    # ========================================================================
+
+    def load_guild_snapshots(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Load all persisted guilds and memberships
+
+        Returns:
+            (guild rows, membership rows) as dicts keyed by column name
+        """
+        with self.get_session() as session:
+            guilds = [dict(row) for row in session.execute(select(Guild.__table__)).mappings()]
+            members = [dict(row) for row in session.execute(select(GuildMembership.__table__)).mappings()]
+        return guilds, members
+
+    def save_guild_snapshots(self, guilds: List[Dict[str, Any]], members: List[Dict[str, Any]],
+                             removed_guild_ids: List[int], removed_members: List[Tuple[int, int]]):
+        """
+        Write a batch of guild changes in one transaction
+
+        Removed memberships ((guild_id, character_id) pairs) and guilds are
+        deleted first, then guild and membership rows are upserted with one
+        executemany statement per table.
+        """
+        with self.get_session() as session:
+            if removed_members:
+                session.execute(
+                    delete(GuildMembership).where(
+                        tuple_(GuildMembership.guild_id, GuildMembership.character_id).in_(removed_members)
+                    )
+                )
+
+            if removed_guild_ids:
+                session.execute(delete(GuildMembership).where(GuildMembership.guild_id.in_(removed_guild_ids)))
+                session.execute(delete(Guild).where(Guild.id.in_(removed_guild_ids)))
+
+            if guilds:
+                stmt = sqlite_insert(Guild)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Guild.id],
+                    set_={key: stmt.excluded[key] for key in guilds[0] if key != 'id'}
+                )
+                session.execute(stmt, guilds)
+
+            if members:
+                stmt = sqlite_insert(GuildMembership)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[GuildMembership.character_id],
+                    set_={key: stmt.excluded[key] for key in members[0] if key != 'character_id'}
+                )
+                session.execute(stmt, members)
+
     # ========================================================================
     # LOGGING
     # ========================================================================
@@ -416,3 +502,11 @@ class DatabaseManager:
                 details=details
             )
             session.add(log)
+
+    def log_events_bulk(self, events: List[Dict[str, Any]]):
+        """Insert many game log rows (dicts keyed by GameLog column names) at once"""
+        if not events:
+            return
+
+        with self.get_session() as session:
+            session.execute(insert(GameLog), events)
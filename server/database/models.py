@@ -246,6 +246,38 @@ class TerritoryControl(Base):
         return f"<TerritoryControl(territory_id={self.territory_id}, controller='{self.controller_name}')>"
 
 
+class Guild(Base):
+    """Persisted guild state"""
+    __tablename__ = 'guilds'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(32), unique=True, nullable=False)
+    tag = Column(String(5), nullable=False)
+    level = Column(Integer, default=1)
+    experience = Column(Integer, default=0)
+    treasury = Column(Integer, default=0)
+    guild_points = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Guild(id={self.id}, name='{self.name}', level={self.level})>"
+
+
+class GuildMembership(Base):
+    """Guild membership (a character belongs to at most one guild)"""
+    __tablename__ = 'guild_members'
+
+    character_id = Column(Integer, ForeignKey('characters.id'), primary_key=True)
+    guild_id = Column(Integer, ForeignKey('guilds.id'), nullable=False, index=True)
+    character_name = Column(String(16), nullable=False)
+    rank = Column(String(10), default='member')  # leader, officer, member
+    contribution_points = Column(Integer, default=0)
+    joined_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GuildMembership(character_id={self.character_id}, guild_id={self.guild_id}, rank='{self.rank}')>"
+
+
 class NPCInstance(Base):
     """Spawned NPC instances in the world"""
     __tablename__ = 'npc_instances'
@@ -3,7 +3,8 @@ Subjugate Online - Advanced Chat System
 Multi-channel chat with private messages, guild chat, and moderation
 """
 
-from typing import Dict, List, Optional, Set
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
 from shared.utils import Logger
 
@@ -82,7 +83,9 @@ class ChatSystem:
 
     def __init__(self):
         self.channels: Dict[str, ChatChannel] = {}
-        self.private_conversations: Dict[str, ChatChannel] = {}  # "id1_id2" -> channel
+        # (lower_id, higher_id) -> channel, kept in least-recently-used order
+        self.private_conversations: "OrderedDict[Tuple[int, int], ChatChannel]" = OrderedDict()
+        self.max_private_conversations = 10000
 
         # Player state
         self.player_active_channels: Dict[int, Set[str]] = {}  # character_id -> channel names
@@ -129,12 +132,14 @@ class ChatSystem:
         Returns:
             True if message was sent, False if failed
         """
+        now = datetime.utcnow()
+
         # Check if player is muted
-        if self._is_player_muted(sender_id):
+        if self._is_player_muted(sender_id, now):
             return False
 
         # Check cooldown
-        if not self._check_cooldown(sender_id):
+        if not self._check_cooldown(sender_id, now):
             return False
 
         # Get channel
@@ -156,9 +161,9 @@ class ChatSystem:
         channel.add_message(chat_message)
 
         # Update cooldown
-        self.message_cooldowns[sender_id] = datetime.utcnow()
+        self.message_cooldowns[sender_id] = now
 
-        logger.debug(f"[{channel_name}] {sender_name}: {filtered_message}")
+        logger.debug("[%s] %s: %s", channel_name, sender_name, filtered_message)
 
         return True
 
@@ -183,19 +188,24 @@ class ChatSystem:
         # Get or create private channel
         channel_key = self._get_private_channel_key(sender_id, recipient_id)
 
-        if channel_key not in self.private_conversations:
+        channel = self.private_conversations.get(channel_key)
+        if channel:
+            self.private_conversations.move_to_end(channel_key)
+        else:
             channel = ChatChannel(f"Private: {sender_name} <-> {recipient_name}", 'whisper', '#FF00FF')
             channel.members.add(sender_id)
             channel.members.add(recipient_id)
             self.private_conversations[channel_key] = channel
 
-        channel = self.private_conversations[channel_key]
+            # Evict the least recently used conversation
+            if len(self.private_conversations) > self.max_private_conversations:
+                self.private_conversations.popitem(last=False)
 
         # Create message
         chat_message = ChatMessage(sender_id, sender_name, message, 'whisper')
         channel.add_message(chat_message)
 
-        logger.debug(f"[Whisper] {sender_name} -> {recipient_name}: {message}")
+        logger.debug("[Whisper] %s -> %s: %s", sender_name, recipient_name, message)
 
         return True
 
@@ -219,7 +229,7 @@ class ChatSystem:
         chat_message = ChatMessage(sender_id, sender_name, message, channel_name)
         channel.add_message(chat_message)
 
-        logger.debug(f"[Guild {guild_id}] {sender_name}: {message}")
+        logger.debug("[Guild %s] %s: %s", guild_id, sender_name, message)
 
         return True
 
@@ -257,27 +267,35 @@ class ChatSystem:
         if not channel:
             return []
 
+        self.private_conversations.move_to_end(channel_key)
+
         return channel.get_recent_messages(count)
 
-    def _check_cooldown(self, character_id: int) -> bool:
+    def _check_cooldown(self, character_id: int, now: Optional[datetime] = None) -> bool:
         """Check if player is off cooldown"""
         if character_id not in self.message_cooldowns:
             return True
 
+        if now is None:
+            now = datetime.utcnow()
+
         last_message = self.message_cooldowns[character_id]
-        time_since = (datetime.utcnow() - last_message).total_seconds()
+        time_since = (now - last_message).total_seconds()
 
         return time_since >= self.message_cooldown
 
-    def _is_player_muted(self, character_id: int) -> bool:
+    def _is_player_muted(self, character_id: int, now: Optional[datetime] = None) -> bool:
         """Check if player is globally muted"""
         if character_id not in self.player_mute_status:
             return False
 
+        if now is None:
+            now = datetime.utcnow()
+
         mute_end = self.player_mute_status[character_id]
 
         # Check if mute expired
-        if datetime.utcnow() >= mute_end:
+        if now >= mute_end:
             del self.player_mute_status[character_id]
             return False
 
@@ -299,11 +317,10 @@ class ChatSystem:
 
         return filtered
 
-    def _get_private_channel_key(self, id1: int, id2: int) -> str:
+    def _get_private_channel_key(self, id1: int, id2: int) -> Tuple[int, int]:
         """Get unique key for private channel"""
         # Always use lower ID first for consistency
-        lower, higher = (id1, id2) if id1 < id2 else (id2, id1)
-        return f"{lower}_{higher}"
+        return (id1, id2) if id1 < id2 else (id2, id1)
 
     # ========================================================================
     # MODERATION
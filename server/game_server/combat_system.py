@@ -89,7 +89,7 @@ class CombatSystem:
             'target_died': target_died
         }
 
-        logger.debug(f"Basic attack: {attacker.name} -> Target {target_id}, damage={damage}, died={target_died}")
+        logger.debug("Basic attack: %s -> Target %s, damage=%s, died=%s", attacker.name, target_id, damage, target_died)
 
         return result
 
@@ -209,7 +209,7 @@ class CombatSystem:
             'caster_mp': caster.mp
         }
 
-        logger.debug(f"Skill used: {caster.name} used {skill_data.get('name')}, targets={len(targets_hit)}")
+        logger.debug("Skill used: %s used %s, targets=%d", caster.name, skill_data.get('name'), len(targets_hit))
 
         return result
 
@@ -302,7 +302,7 @@ class CombatSystem:
         # This would be updated in database in real implementation
         # For now just track in memory
 
-        logger.debug(f"XP granted: {player.name} gained {final_xp} XP")
+        logger.debug("XP granted: %s gained %s XP", player.name, final_xp)
 
         # Check for level up (simplified)
         # In full implementation, this would check against character's current XP
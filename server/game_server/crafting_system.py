@@ -3,18 +3,51 @@ Subjugate Online - Crafting and Gathering System
 Allows players to gather resources and craft items (ironman-compatible)
 """
 
-from typing import Dict, List, Optional, Tuple
-from shared.utils import Logger
+from collections import defaultdict
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+from shared.constants import CHUNK_SIZE
+from shared.utils import get_chunk_id, get_surrounding_chunks, Logger
 from shared.game_data import get_item_data
+import bisect
 import random
+import threading
 import time
 
 logger = Logger.get_logger(__name__)
 
+# Per-thread random generators, so concurrent gathers never share one state
+_thread_local = threading.local()
+
+
+def _get_rng() -> random.Random:
+    """Get the calling thread's random generator"""
+    rng = getattr(_thread_local, 'rng', None)
+    if rng is None:
+        rng = random.Random()
+        _thread_local.rng = rng
+    return rng
+
+
+class LootEntry(NamedTuple):
+    """A row of a gathering node's loot table"""
+    item_id: int
+    min_amount: int
+    max_amount: int
+    chance: float
+
 
 class GatheringNode:
     """Represents a gathering node in the world"""
 
+    __slots__ = (
+        'node_id', 'node_type', 'position', 'required_level', 'depleted',
+        'respawn_time', 'last_gathered', '_loot_table', '_loot_ids',
+        '_loot_mins', '_loot_spans', '_loot_chances', '_adjusted_chances',
+        '_roll_plans'
+    )
+
     def __init__(
         self,
         node_id: int,
@@ -28,11 +61,55 @@ class GatheringNode:
         self.required_level = required_level
         self.depleted = False
         self.respawn_time = 300.0  # 5 minutes
-        self.last_gathered = 0.0
+        self.last_gathered = 0.0  # time.monotonic() timestamp
 
-        # Loot table with (item_id, min_amount, max_amount, chance)
+        # Loot table of LootEntry(item_id, min_amount, max_amount, chance) rows
         self.loot_table = []
 
+    @property
+    def loot_table(self) -> Tuple[LootEntry, ...]:
+        """Loot table rows"""
+        return self._loot_table
+
+    @loot_table.setter
+    def loot_table(self, loot_table: Sequence[Tuple[int, int, int, float]]):
+        self._loot_table = tuple(LootEntry(*row) for row in loot_table)
+
+        # Column layout used by gather()
+        self._loot_ids = tuple(entry.item_id for entry in self._loot_table)
+        self._loot_mins = tuple(entry.min_amount for entry in self._loot_table)
+        self._loot_spans = tuple(entry.max_amount - entry.min_amount + 1 for entry in self._loot_table)
+        self._loot_chances = tuple(entry.chance for entry in self._loot_table)
+
+        # skill_level -> adjusted chances
+        self._adjusted_chances: Dict[int, Tuple[float, ...]] = {}
+
+        # skill_level -> (item_id, min_amount, amount_span, adjusted_chance) rows
+        self._roll_plans: Dict[int, Tuple[Tuple[int, int, int, float], ...]] = {}
+
+    def _get_adjusted_chances(self, skill_level: int) -> Tuple[float, ...]:
+        """Get loot chances adjusted for a skill level"""
+        adjusted = self._adjusted_chances.get(skill_level)
+        if adjusted is None:
+            # Skill level affects success chance
+            skill_multiplier = 1.0 + (skill_level * 0.01)
+            adjusted = tuple(chance * skill_multiplier for chance in self._loot_chances)
+            self._adjusted_chances[skill_level] = adjusted
+        return adjusted
+
+    def _get_roll_plan(self, skill_level: int) -> Tuple[Tuple[int, int, int, float], ...]:
+        """Get this node's loot rolls, fully precomputed for a skill level"""
+        plan = self._roll_plans.get(skill_level)
+        if plan is None:
+            plan = tuple(zip(
+                self._loot_ids,
+                self._loot_mins,
+                self._loot_spans,
+                self._get_adjusted_chances(skill_level)
+            ))
+            self._roll_plans[skill_level] = plan
+        return plan
+
     def can_gather(self, current_time: float) -> bool:
         """Check if node can be gathered"""
         if not self.depleted:
@@ -45,39 +122,72 @@ class GatheringNode:
 
         return False
 
-    def gather(self, character_level: int, skill_level: int) -> Optional[List[Tuple[int, int]]]:
+    def gather(
+        self,
+        character_level: int,
+        skill_level: int,
+        current_time: float
+    ) -> Optional[List[Tuple[int, int]]]:
         """
         Gather from this node
 
         Returns:
             List of (item_id, amount) tuples or None if failed
         """
-        if self.depleted:
+        if not self.can_gather(current_time):
             return None
 
         if character_level < self.required_level:
             return None
 
-        # Roll for loot
+        # Roll for loot (amounts come from random() directly, randint() is much slower)
+        rnd = _get_rng().random
         items_gathered = []
-        for item_id, min_amt, max_amt, chance in self.loot_table:
-            # Skill level affects success chance
-            adjusted_chance = chance * (1.0 + (skill_level * 0.01))
-
-            if random.random() < adjusted_chance:
-                amount = random.randint(min_amt, max_amt)
-                items_gathered.append((item_id, amount))
+        for item_id, min_amt, span, chance in self._get_roll_plan(skill_level):
+            if rnd() < chance:
+                items_gathered.append((item_id, min_amt + int(rnd() * span)))
 
         # Mark as depleted
         self.depleted = True
-        self.last_gathered = time.time()
+        self.last_gathered = current_time
 
         return items_gathered if items_gathered else None
 
+    def simulate_gathers(self, count: int, skill_level: int) -> Dict[int, int]:
+        """
+        Roll this node's loot table many times without depleting it
+
+        Used for drop-rate tuning and balancing. All rolls are drawn as one
+        (count, loot entries) batch with NumPy.
+
+        Returns:
+            Dict of item_id -> total amount over all rolls
+        """
+        rng = np.random.default_rng()
+        loot_mins = np.asarray(self._loot_mins, dtype=np.int64)
+        loot_spans = np.asarray(self._loot_spans, dtype=np.int64)
+        adjusted_chances = np.asarray(self._get_adjusted_chances(skill_level), dtype=np.float64)
+
+        shape = (count, len(self._loot_ids))
+        draws = rng.random(shape)
+        amounts = rng.integers(loot_mins, loot_mins + loot_spans, size=shape)
+        entry_totals = np.where(draws < adjusted_chances, amounts, 0).sum(axis=0)
+
+        totals = dict.fromkeys(self._loot_ids, 0)
+        for item_id, total in zip(self._loot_ids, entry_totals.tolist()):
+            totals[item_id] += total
+
+        return totals
+
 
 class CraftingRecipe:
     """Represents a crafting recipe"""
 
+    __slots__ = (
+        'recipe_id', 'name', 'profession', 'required_level', 'result_item_id',
+        'result_amount', 'materials', '_material_checks', 'craft_time'
+    )
+
     def __init__(
         self,
         recipe_id: int,
@@ -97,6 +207,9 @@ class CraftingRecipe:
         # Materials: {item_id: amount}
         self.materials: Dict[int, int] = {}
 
+        # Materials as (item_id, amount), largest requirement first
+        self._material_checks: Tuple[Tuple[int, int], ...] = ()
+
         # Crafting time in seconds
         self.craft_time = 5.0
 
@@ -104,13 +217,22 @@ class CraftingRecipe:
         """Add required material"""
         self.materials[item_id] = amount
 
+        # Larger requirements are the likeliest to be missing, so check them first
+        self._material_checks = tuple(
+            sorted(self.materials.items(), key=lambda material: material[1], reverse=True)
+        )
+
+    def freeze_materials(self):
+        """Make the material list read-only once the recipe is fully built"""
+        self.materials = MappingProxyType(dict(self.materials))
+
     def can_craft(self, inventory: Dict[int, int], skill_level: int) -> bool:
         """Check if can craft with current inventory and skill"""
         if skill_level < self.required_level:
             return False
 
         # Check materials
-        for item_id, required_amount in self.materials.items():
+        for item_id, required_amount in self._material_checks:
             if inventory.get(item_id, 0) < required_amount:
                 return False
 
@@ -123,7 +245,16 @@ class CraftingSystem:
     def __init__(self):
         self.recipes: Dict[int, CraftingRecipe] = {}
         self.gathering_nodes: Dict[int, GatheringNode] = {}
-        self.player_skills: Dict[int, Dict[str, int]] = {}  # character_id -> {skill: level}
+        self.node_chunks: Dict[Tuple[int, int], List[GatheringNode]] = {}  # chunk_id -> nodes
+        self.player_skills: Dict[int, Dict[str, int]] = defaultdict(dict)  # character_id -> {skill: level}
+        self.player_skill_xp: Dict[int, Dict[str, int]] = defaultdict(dict)  # character_id -> {skill: xp}
+
+        # Skill XP waiting to be applied: (character_id, skill) -> xp
+        self.pending_skill_xp: Dict[Tuple[int, str], int] = {}
+
+        # profession -> (required levels, recipes), both sorted by required level
+        self.recipes_by_profession: Dict[str, Tuple[List[int], List[CraftingRecipe]]] = {}
+        self.recipes_by_material: Dict[int, Set[int]] = {}  # material item_id -> recipe IDs
 
         # Initialize recipes and nodes
         self._initialize_crafting_recipes()
@@ -183,7 +314,32 @@ class CraftingSystem:
         recipe.add_material(5101, 1)  # 1x Empty Bottle
         self.recipes[101] = recipe
 
-        logger.info(f"Loaded {len(self.recipes)} crafting recipes")
+        # Recipes are read-only from here on
+        for recipe in self.recipes.values():
+            recipe.freeze_materials()
+
+        self._index_recipes()
+
+        logger.info("Loaded %d crafting recipes", len(self.recipes))
+
+    def _index_recipes(self):
+        """Rebuild the per-profession and per-material recipe indexes"""
+        self.recipes_by_profession = {}
+        self.recipes_by_material = {}
+
+        for recipe in self.recipes.values():
+            for item_id in recipe.materials:
+                if item_id not in self.recipes_by_material:
+                    self.recipes_by_material[item_id] = set()
+                self.recipes_by_material[item_id].add(recipe.recipe_id)
+
+        for recipe in sorted(self.recipes.values(), key=lambda r: r.required_level):
+            if recipe.profession not in self.recipes_by_profession:
+                self.recipes_by_profession[recipe.profession] = ([], [])
+
+            levels, recipes = self.recipes_by_profession[recipe.profession]
+            levels.append(recipe.required_level)
+            recipes.append(recipe)
 
     def _initialize_gathering_nodes(self):
         """Initialize gathering nodes in the world"""
@@ -231,7 +387,19 @@ class CraftingSystem:
         ]
         self.gathering_nodes[300] = node
 
-        logger.info(f"Spawned {len(self.gathering_nodes)} gathering nodes")
+        self._index_gathering_nodes()
+
+        logger.info("Spawned %d gathering nodes", len(self.gathering_nodes))
+
+    def _index_gathering_nodes(self):
+        """Rebuild the chunk index of gathering nodes"""
+        self.node_chunks = {}
+
+        for node in self.gathering_nodes.values():
+            chunk_id = get_chunk_id(node.position, CHUNK_SIZE)
+            if chunk_id not in self.node_chunks:
+                self.node_chunks[chunk_id] = []
+            self.node_chunks[chunk_id].append(node)
 
     def gather_from_node(
         self,
@@ -253,12 +421,12 @@ class CraftingSystem:
         skill_level = self._get_skill_level(character_id, node.node_type)
 
         # Attempt to gather
-        items = node.gather(character_level, skill_level)
+        items = node.gather(character_level, skill_level, time.monotonic())
 
         if items:
             # Award skill XP
             self._add_skill_experience(character_id, node.node_type, 10)
-            logger.info(f"Character {character_id} gathered from node {node_id}: {items}")
+            logger.info("Character %s gathered from node %s: %s", character_id, node_id, items)
 
         return items
 
@@ -296,38 +464,61 @@ class CraftingSystem:
         # Award skill XP
         self._add_skill_experience(character_id, recipe.profession, 25)
 
-        logger.info(f"Character {character_id} crafted {recipe.name}")
+        logger.info("Character %s crafted %s", character_id, recipe.name)
 
         return (recipe.result_item_id, recipe.result_amount)
 
     def _get_skill_level(self, character_id: int, skill: str) -> int:
         """Get player's skill level"""
-        if character_id not in self.player_skills:
-            self.player_skills[character_id] = {}
-
         return self.player_skills[character_id].get(skill, 1)
 
     def _add_skill_experience(self, character_id: int, skill: str, xp: int):
-        """Add skill experience"""
-        if character_id not in self.player_skills:
-            self.player_skills[character_id] = {}
+        """Queue skill experience, applied on the next flush_skill_experience()"""
+        key = (character_id, skill)
+        self.pending_skill_xp[key] = self.pending_skill_xp.get(key, 0) + xp
+
+    def flush_skill_experience(self):
+        """Apply all queued skill experience"""
+        pending = self.pending_skill_xp
+        if not pending:
+            return
+
+        self.pending_skill_xp = {}
 
-        if skill not in self.player_skills[character_id]:
-            self.player_skills[character_id][skill] = 1
+        for (character_id, skill), xp in pending.items():
+            skill_xp = self.player_skill_xp[character_id]
+            skill_xp[skill] = skill_xp.get(skill, 0) + xp
 
-        # Simplified skill leveling
-        current_level = self.player_skills[character_id][skill]
-        if current_level < 99:
-            # Every 100 XP = 1 level (simplified)
-            # In production, this would use an experience table
-            pass
+            # Simplified skill leveling
+            current_level = self.player_skills[character_id].setdefault(skill, 1)
+            if current_level < 99:
+                # Every 100 XP = 1 level (simplified)
+                # In production, this would use an experience table
+                pass
 
     def get_recipes_for_profession(self, profession: str, skill_level: int) -> List[CraftingRecipe]:
         """Get available recipes for a profession"""
-        return [
-            r for r in self.recipes.values()
-            if r.profession == profession and skill_level >= r.required_level
-        ]
+        index = self.recipes_by_profession.get(profession)
+        if not index:
+            return []
+
+        levels, recipes = index
+        return recipes[:bisect.bisect_right(levels, skill_level)]
+
+    def get_craftable_recipes(self, character_id: int, inventory: Dict[int, int]) -> List[CraftingRecipe]:
+        """Get recipes the character can craft right now with their inventory"""
+        # Only recipes using at least one held material can possibly qualify
+        candidate_ids = set()
+        for item_id in inventory:
+            candidate_ids.update(self.recipes_by_material.get(item_id, ()))
+
+        craftable = []
+        for recipe_id in sorted(candidate_ids):
+            recipe = self.recipes[recipe_id]
+            if recipe.can_craft(inventory, self._get_skill_level(character_id, recipe.profession)):
+                craftable.append(recipe)
+
+        return craftable
 
     def get_nearby_nodes(
         self,
@@ -335,23 +526,33 @@ class CraftingSystem:
         radius: float
     ) -> List[GatheringNode]:
         """Get gathering nodes near a position"""
-        from shared.utils import calculate_distance
+        chunk_id = get_chunk_id(position, CHUNK_SIZE)
+        search_radius = int(radius / CHUNK_SIZE) + 1
+
+        # Compare squared distances to skip the sqrt
+        px, py, pz = position
+        radius_sq = radius * radius
 
         nearby = []
-        for node in self.gathering_nodes.values():
-            if calculate_distance(position, node.position) <= radius:
-                nearby.append(node)
+        for chunk in get_surrounding_chunks(chunk_id, search_radius):
+            for node in self.node_chunks.get(chunk, ()):
+                node_pos = node.position
+                dx = node_pos[0] - px
+                dy = node_pos[1] - py
+                dz = node_pos[2] - pz
+                if dx*dx + dy*dy + dz*dz <= radius_sq:
+                    nearby.append(node)
 
         return nearby
 
     def update_nodes(self, delta_time: float):
-        """Update gathering nodes (respawn timer)"""
-        current_time = time.time()
+        """
+        Update gathering nodes and apply queued skill experience
 
-        for node in self.gathering_nodes.values():
-            if node.depleted:
-                if current_time - node.last_gathered >= node.respawn_time:
-                    node.depleted = False
+        Respawns are resolved lazily by GatheringNode.can_gather when a node
+        is next used, so nodes need no per-tick work here.
+        """
+        self.flush_skill_experience()
 
     def get_player_skills(self, character_id: int) -> Dict[str, int]:
         """Get player's skill levels"""
@@ -4,16 +4,21 @@ Main game server handling world simulation, combat, and player interactions
 """
 
 import asyncio
+import heapq
 import signal
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
 from shared.constants import (
     GAME_SERVER_HOST, GAME_SERVER_PORT, TICK_RATE, NETWORK_UPDATE_RATE,
-    PacketType, ErrorCode, RESPAWN_TIME
+    PacketType, ErrorCode, RESPAWN_TIME, SEND_QUEUE_SIZE, VIEW_DISTANCE,
+    WRITE_BUFFER_HIGH_WATER, WRITE_BUFFER_LOW_WATER
 )
 from shared.utils import Logger, get_spawn_position
 from server.network.protocol import (
-    Packet, PacketBuffer, create_player_spawn, create_player_despawn,
+    Packet, read_packet, create_player_spawn, create_player_despawn,
     create_player_position_update, create_stats_update, create_damage_dealt,
     create_player_death, create_reincarnation_response, create_territory_status,
     create_territory_captured, create_chat_message, create_npc_spawn,
@@ -29,6 +34,43 @@ from server.game_server.npc_ai import NPCAISystem
 logger = Logger.get_logger(__name__)
 
 
+def _character_to_world_dict(character) -> dict:
+    """Build the data WorldManager.add_player expects from a Character row"""
+    return {
+        'character_id': character.id,
+        'name': character.name,
+        'level': character.level,
+        'hp': character.hp,
+        'max_hp': character.max_hp,
+        'mp': character.mp,
+        'max_mp': character.max_mp,
+        'attack': character.attack,
+        'defense': character.defense,
+        'speed': character.speed,
+        'position_x': character.position_x,
+        'position_y': character.position_y,
+        'position_z': character.position_z,
+        'rotation': character.rotation,
+        'game_mode': character.game_mode,
+        'reincarnation_count': character.reincarnation_count,
+        'reincarnation_perks': character.reincarnation_perks or {}
+    }
+
+
+def _player_snapshot(player: PlayerEntity, online: bool) -> dict:
+    """Build the row DatabaseManager.save_character_snapshots expects for a player"""
+    return {
+        'id': player.character_id,
+        'position_x': player.position[0],
+        'position_y': player.position[1],
+        'position_z': player.position[2],
+        'rotation': player.rotation,
+        'hp': player.hp,
+        'mp': player.mp,
+        'is_online': online
+    }
+
+
 class GameClientConnection:
     """Represents a client connection to game server"""
 
@@ -36,41 +78,93 @@ class GameClientConnection:
         self.reader = reader
         self.writer = writer
         self.address = address
-        self.buffer = PacketBuffer()
+        self.client_id = f"{address[0]}:{address[1]}"
         self.character_id: Optional[int] = None
         self.session_token: Optional[str] = None
         self.last_heartbeat = time.time()
 
-    async def send_packet(self, packet: Packet):
-        """Send a packet to the client"""
+        # Outbound packets, written by a dedicated writer task
+        self.out_queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.writer_task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.writer.transport.set_write_buffer_limits(
+            high=WRITE_BUFFER_HIGH_WATER,
+            low=WRITE_BUFFER_LOW_WATER
+        )
+
+    def send_packet(self, packet: Packet):
+        """Queue a packet for the client"""
         try:
-            data = packet.serialize()
-            self.writer.write(data)
-            await self.writer.drain()
+            self.send_data(packet.serialize())
         except Exception as e:
             logger.error(f"Failed to send packet to {self.address}: {e}")
 
-    async def receive_packet(self) -> Optional[Packet]:
-        """Receive a packet from the client"""
-        try:
-            data = await self.reader.read(4096)
-            if not data:
-                return None
+    def send_data(self, data: bytes):
+        """Queue serialized packet data for the client"""
+        if self.closed:
+            return
 
-            self.buffer.add_data(data)
+        try:
+            self.out_queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # Client is not keeping up, drop it (and its backlog) rather than buffering forever
+            logger.warning(f"Send queue full for {self.address}, dropping client")
+            self.close(discard_pending=True)
+
+    async def write_loop(self):
+        """Write queued packets to the client"""
+        try:
+            while True:
+                batch = [await self.out_queue.get()]
 
-            if self.buffer.has_complete_packet():
-                return self.buffer.get_packet()
+                # Coalesce everything queued since the last wakeup into one write
+                while not self.out_queue.empty():
+                    batch.append(self.out_queue.get_nowait())
 
-            return None
+                self.writer.writelines(batch)
 
+                # Only wait on the socket once the client falls behind
+                if self.writer.transport.get_write_buffer_size() > WRITE_BUFFER_HIGH_WATER:
+                    await self.writer.drain()
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
-            logger.error(f"Failed to receive packet from {self.address}: {e}")
-            return None
+            logger.error(f"Failed to send packet to {self.address}: {e}")
+
+    async def receive_packet(self) -> Optional[Packet]:
+        """
+        Receive the next packet from the client
+
+        Returns:
+            Packet or None if it could not be decoded
+
+        Raises:
+            asyncio.IncompleteReadError: if the client disconnected
+        """
+        return await read_packet(self.reader)
+
+    def close(self, discard_pending: bool = False):
+        """
+        Close the connection
+
+        Args:
+            discard_pending: Drop queued packets instead of writing them first
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+
+        if self.writer_task:
+            self.writer_task.cancel()
+            self.writer_task = None
 
-    def close(self):
-        """Close the connection"""
         try:
+            while not self.out_queue.empty():
+                data = self.out_queue.get_nowait()
+                # Hand anything still queued to the transport before closing
+                if not discard_pending:
+                    self.writer.write(data)
             self.writer.close()
         except:
             pass
@@ -79,6 +173,9 @@ class GameClientConnection:
 class GameServer:
     """Main game server"""
 
+    # Chat channels every player is subscribed to on login
+    DEFAULT_CHAT_CHANNELS = ('global', 'trade', 'help')
+
     def __init__(self, host: str = GAME_SERVER_HOST, port: int = GAME_SERVER_PORT):
         self.host = host
         self.port = port
@@ -94,6 +191,7 @@ class GameServer:
         # Client connections
         self.clients: Dict[str, GameClientConnection] = {}
         self.character_to_client: Dict[int, str] = {}  # character_id -> client_id
+        self.chat_channels: Dict[str, Set[int]] = {}  # channel -> subscribed character_ids
 
         # Server state
         self.running = False
@@ -101,8 +199,19 @@ class GameServer:
         self.tick_time = 1.0 / TICK_RATE
         self.network_update_time = 1.0 / NETWORK_UPDATE_RATE
 
-        # Respawn queue
-        self.respawn_queue: Dict[int, float] = {}  # {character_id: respawn_time}
+        # Packet type -> handler(client, packet)
+        self.packet_handlers = {
+            PacketType.GAME_SERVER_CONNECT: self.handle_game_connect,
+            PacketType.PLAYER_MOVE: self.handle_player_move,
+            PacketType.ATTACK_REQUEST: self.handle_attack_request,
+            PacketType.SKILL_USE: self.handle_skill_use,
+            PacketType.REINCARNATION_REQUEST: self.handle_reincarnation_request,
+            PacketType.CHAT_MESSAGE: self.handle_chat_message,
+            PacketType.HEARTBEAT: self.handle_heartbeat
+        }
+
+        # Respawn queue, a min-heap of (respawn_time, character_id)
+        self.respawn_queue: List[Tuple[float, int]] = []
 
     async def start(self):
         """Start the game server"""
@@ -137,9 +246,20 @@ class GameServer:
         logger.info("Shutting down game server...")
         self.running = False
 
-        # Save all player states
+        # Save all player states in one batch
+        snapshots = []
+        for character_id in self.character_to_client:
+            player = self.world.get_player(character_id)
+            if player:
+                snapshots.append(_player_snapshot(player, online=False))
+
+        self.db.save_character_snapshots(snapshots)
+
+        # Persist territory captures still waiting for the next flush
+        self.territory.flush_pending()
+
         for character_id in list(self.character_to_client.keys()):
-            await self.handle_player_disconnect(character_id)
+            await self.handle_player_disconnect(character_id, save_state=False)
 
         # Close all client connections
         for client in list(self.clients.values()):
@@ -158,20 +278,22 @@ class GameServer:
         logger.info(f"New game client connection from {address}")
 
         client = GameClientConnection(reader, writer, address)
-        client_id = f"{address[0]}:{address[1]}"
+        client_id = client.client_id
         self.clients[client_id] = client
+        client.writer_task = asyncio.create_task(client.write_loop())
 
         try:
             while self.running:
                 packet = await client.receive_packet()
 
                 if packet is None:
-                    if reader.at_eof():
-                        break
                     continue
 
                 # Handle packet
-                await self.handle_packet(client, client_id, packet)
+                await self.handle_packet(client, packet)
+
+        except asyncio.IncompleteReadError:
+            pass
 
         except Exception as e:
             logger.error(f"Error handling game client {address}: {e}")
@@ -187,38 +309,20 @@ class GameServer:
 
             logger.info(f"Game client disconnected: {address}")
 
-    async def handle_packet(self, client: GameClientConnection, client_id: str, packet: Packet):
+    async def handle_packet(self, client: GameClientConnection, packet: Packet):
         """Handle incoming packet from client"""
         try:
-            if packet.packet_type == PacketType.GAME_SERVER_CONNECT:
-                await self.handle_game_connect(client, client_id, packet)
-
-            elif packet.packet_type == PacketType.PLAYER_MOVE:
-                await self.handle_player_move(client, packet)
-
-            elif packet.packet_type == PacketType.ATTACK_REQUEST:
-                await self.handle_attack_request(client, packet)
-
-            elif packet.packet_type == PacketType.SKILL_USE:
-                await self.handle_skill_use(client, packet)
-
-            elif packet.packet_type == PacketType.REINCARNATION_REQUEST:
-                await self.handle_reincarnation_request(client, packet)
-
-            elif packet.packet_type == PacketType.CHAT_MESSAGE:
-                await self.handle_chat_message(client, packet)
-
-            elif packet.packet_type == PacketType.HEARTBEAT:
-                client.last_heartbeat = time.time()
-
+            handler = self.packet_handlers.get(packet.packet_type)
+            if handler:
+                await handler(client, packet)
             else:
                 logger.warning(f"Unknown packet type: {packet.packet_type}")
 
         except Exception as e:
             logger.error(f"Error handling packet {packet.packet_type}: {e}")
-            await client.send_packet(create_error_packet(ErrorCode.INVALID_PACKET, str(e)))
+            client.send_packet(create_error_packet(ErrorCode.INVALID_PACKET, str(e)))
 
-    async def handle_game_connect(self, client: GameClientConnection, client_id: str, packet: Packet):
+    async def handle_game_connect(self, client: GameClientConnection, packet: Packet):
         """Handle game server connection/handshake"""
         session_token = packet.data.get('session_token', '')
         character_id = packet.data.get('character_id', 0)
@@ -226,7 +330,7 @@ class GameServer:
         # Validate session
         session = self.db.validate_session(session_token)
         if not session:
-            await client.send_packet(create_error_packet(
+            client.send_packet(create_error_packet(
                 ErrorCode.INVALID_SESSION,
                 "Invalid session"
             ))
@@ -236,7 +340,7 @@ class GameServer:
         # Get character
         character = self.db.get_character_by_id(character_id)
         if not character or character.account_id != session.account_id:
-            await client.send_packet(create_error_packet(
+            client.send_packet(create_error_packet(
                 ErrorCode.INVALID_CHARACTER,
                 "Invalid character"
             ))
@@ -246,30 +350,14 @@ class GameServer:
         # Store client info
         client.character_id = character_id
         client.session_token = session_token
-        self.character_to_client[character_id] = client_id
+        self.character_to_client[character_id] = client.client_id
 
-        # Add player to world
-        character_data = {
-            'character_id': character.id,
-            'name': character.name,
-            'level': character.level,
-            'hp': character.hp,
-            'max_hp': character.max_hp,
-            'mp': character.mp,
-            'max_mp': character.max_mp,
-            'attack': character.attack,
-            'defense': character.defense,
-            'speed': character.speed,
-            'position_x': character.position_x,
-            'position_y': character.position_y,
-            'position_z': character.position_z,
-            'rotation': character.rotation,
-            'game_mode': character.game_mode,
-            'reincarnation_count': character.reincarnation_count,
-            'reincarnation_perks': character.reincarnation_perks or {}
-        }
+        for channel in self.DEFAULT_CHAT_CHANNELS:
+            self.join_chat_channel(character_id, channel)
 
-        player = self.world.add_player(character_id, character_data)
+        # Add player to world
+        player = self.world.add_player(character_id, _character_to_world_dict(character))
+        player.client = client
 
         # Apply reincarnation perks
         if character.reincarnation_perks:
@@ -284,25 +372,30 @@ class GameServer:
         logger.info(f"Player joined game: {character.name} (ID: {character_id})")
 
         # Send spawn to joining player (self)
-        await client.send_packet(create_player_spawn(character_id, player.get_stats()))
+        spawn_packet = create_player_spawn(character_id, player.get_stats())
+        client.send_packet(spawn_packet)
 
         # Send existing players to joining player
         for existing_player in self.world.get_visible_players(character_id):
             if existing_player.character_id != character_id:
-                await client.send_packet(create_player_spawn(
+                client.send_packet(create_player_spawn(
                     existing_player.character_id,
                     existing_player.get_stats()
                 ))
 
         # Send existing NPCs to joining player
         for npc in self.world.get_visible_npcs(character_id):
-            await client.send_packet(create_npc_spawn(npc.instance_id, npc.get_data()))
+            client.send_packet(create_npc_spawn(npc.instance_id, npc.get_data()))
 
         # Send territory status
-        await client.send_packet(create_territory_status(self.territory.get_territory_status()))
+        client.send_packet(create_territory_status(self.territory.get_territory_status()))
 
-        # Broadcast spawn to other players
-        await self.broadcast_to_nearby(character_id, create_player_spawn(character_id, player.get_stats()))
+        # Broadcast the same spawn to other players
+        self.broadcast_to_nearby(character_id, spawn_packet, exclude_self=True)
+
+    async def handle_heartbeat(self, client: GameClientConnection, packet: Packet):
+        """Handle client heartbeat"""
+        client.last_heartbeat = time.time()
 
     async def handle_player_move(self, client: GameClientConnection, packet: Packet):
         """Handle player movement"""
@@ -337,7 +430,7 @@ class GameServer:
                 result['target_hp']
             )
 
-            await self.broadcast_to_nearby(client.character_id, damage_packet)
+            self.broadcast_to_nearby(client.character_id, damage_packet)
 
             # Handle death
             if result['target_died']:
@@ -347,6 +440,7 @@ class GameServer:
                     # Grant XP
                     if death_data:
                         self.combat.grant_experience(client.character_id, death_data['xp_reward'])
+                        self.reincarnation.invalidate_preview(client.character_id)
 
                         # Update player stats
                         player = self.world.get_player(client.character_id)
@@ -375,7 +469,7 @@ class GameServer:
             # Handle different skill results
             if 'heal_amount' in result:
                 # Healing skill
-                await client.send_packet(create_stats_update(
+                client.send_packet(create_stats_update(
                     client.character_id,
                     {'hp': result['caster_hp'], 'mp': result.get('caster_mp', 0)}
                 ))
@@ -391,12 +485,13 @@ class GameServer:
                         target_hp
                     )
 
-                    await self.broadcast_to_nearby(client.character_id, damage_packet)
+                    self.broadcast_to_nearby(client.character_id, damage_packet)
 
                     if target_died and target_type == 'npc':
                         death_data = self.npc_ai.handle_npc_death(target_id, client.character_id)
                         if death_data:
                             self.combat.grant_experience(client.character_id, death_data['xp_reward'])
+                            self.reincarnation.invalidate_preview(client.character_id)
 
     async def handle_reincarnation_request(self, client: GameClientConnection, packet: Packet):
         """Handle reincarnation request"""
@@ -408,7 +503,7 @@ class GameServer:
 
         if result:
             # Send success
-            await client.send_packet(create_reincarnation_response(
+            client.send_packet(create_reincarnation_response(
                 success=True,
                 perks=result['total_perks'],
                 message=f"Reincarnation {result['reincarnation_count']} complete!"
@@ -419,31 +514,12 @@ class GameServer:
 
             # Reload character
             character = self.db.get_character_by_id(client.character_id)
-            character_data = {
-                'character_id': character.id,
-                'name': character.name,
-                'level': character.level,
-                'hp': character.hp,
-                'max_hp': character.max_hp,
-                'mp': character.mp,
-                'max_mp': character.max_mp,
-                'attack': character.attack,
-                'defense': character.defense,
-                'speed': character.speed,
-                'position_x': character.position_x,
-                'position_y': character.position_y,
-                'position_z': character.position_z,
-                'rotation': character.rotation,
-                'game_mode': character.game_mode,
-                'reincarnation_count': character.reincarnation_count,
-                'reincarnation_perks': character.reincarnation_perks or {}
-            }
-
-            player = self.world.add_player(client.character_id, character_data)
+            player = self.world.add_player(client.character_id, _character_to_world_dict(character))
+            player.client = client
             self.reincarnation.apply_reincarnation_perks_to_player(player, character.reincarnation_perks)
 
         else:
-            await client.send_packet(create_reincarnation_response(
+            client.send_packet(create_reincarnation_response(
                 success=False,
                 error_code=ErrorCode.INSUFFICIENT_LEVEL,
                 message="Cannot reincarnate"
@@ -455,11 +531,19 @@ class GameServer:
             return
 
         message = packet.data.get('message', '')
+        channel = packet.data.get('channel', 'local')
         player = self.world.get_player(client.character_id)
 
-        if player:
-            chat_packet = create_chat_message(player.name, message)
-            await self.broadcast_to_all(chat_packet)
+        if not player:
+            return
+
+        chat_packet = create_chat_message(player.name, message, channel)
+
+        if channel == 'local':
+            # Local chat only reaches players in view
+            self.broadcast_to_nearby(client.character_id, chat_packet)
+        elif client.character_id in self.chat_channels.get(channel, ()):
+            self.broadcast_to_channel(channel, chat_packet)
 
     async def handle_player_death_event(self, character_id: int, killer_id: Optional[int] = None):
         """Handle player death event"""
@@ -467,39 +551,27 @@ class GameServer:
 
         # Broadcast death
         death_packet = create_player_death(character_id, killer_id)
-        await self.broadcast_to_all(death_packet)
+        self.broadcast_to_all(death_packet)
 
         # Queue respawn
-        self.respawn_queue[character_id] = time.time() + RESPAWN_TIME
+        heapq.heappush(self.respawn_queue, (time.time() + RESPAWN_TIME, character_id))
 
         # Log event
         self.db.log_event('player_death', character_id, {'killer_id': killer_id})
 
-    async def handle_player_disconnect(self, character_id: int):
+    async def handle_player_disconnect(self, character_id: int, save_state: bool = True):
         """Handle player disconnect"""
         player = self.world.get_player(character_id)
         if player:
             # Save character state
-            self.db.update_character_position(
-                character_id,
-                player.position[0],
-                player.position[1],
-                player.position[2],
-                player.rotation
-            )
-
-            self.db.update_character_stats(character_id, {
-                'hp': player.hp,
-                'mp': player.mp
-            })
-
-            self.db.set_character_online(character_id, False)
+            if save_state:
+                self.db.save_character_snapshots([_player_snapshot(player, online=False)])
 
             # Remove from world
             self.world.remove_player(character_id)
 
             # Broadcast despawn
-            await self.broadcast_to_all(create_player_despawn(character_id))
+            self.broadcast_to_all(create_player_despawn(character_id))
 
             logger.info(f"Player left game: {player.name} (ID: {character_id})")
 
@@ -507,10 +579,14 @@ class GameServer:
         if character_id in self.character_to_client:
             del self.character_to_client[character_id]
 
+        self.leave_chat_channels(character_id)
+
     async def game_loop(self):
         """Main game loop - handles game logic updates"""
         logger.info("Game loop started")
 
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
         last_time = time.time()
 
         while self.running:
@@ -531,17 +607,25 @@ class GameServer:
             except Exception as e:
                 logger.error(f"Error in game loop: {e}")
 
-            # Sleep to maintain tick rate
-            await asyncio.sleep(self.tick_time)
+            # Sleep until the next tick is due to maintain tick rate
+            next_tick = await self._sleep_until_next_tick(loop, next_tick, self.tick_time)
 
     async def network_sync_loop(self):
         """Network synchronization loop - broadcasts state updates"""
         logger.info("Network sync loop started")
 
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+
         while self.running:
             try:
-                # Broadcast player positions
-                for player in self.world.get_all_players():
+                # Players in range are found with one vectorized check
+                # against candidates gathered once per occupied chunk, shared
+                # by the player and NPC sweeps
+                candidates_by_chunk = {}
+
+                # Broadcast positions of players that moved
+                for player in self.world.pop_dirty_players():
                     position_packet = create_player_position_update(
                         player.character_id,
                         player.position[0],
@@ -550,7 +634,8 @@ class GameServer:
                         player.rotation
                     )
 
-                    await self.broadcast_to_nearby(player.character_id, position_packet, exclude_self=True)
+                    self._send_in_view(candidates_by_chunk, player.chunk_id, player.position,
+                                       position_packet, exclude=player)
 
                 # Broadcast NPC updates
                 for npc in self.world.get_all_npcs():
@@ -558,59 +643,117 @@ class GameServer:
                         continue
 
                     npc_packet = create_npc_update(npc.instance_id, npc.get_data())
-
-                    # Send to all nearby players
-                    nearby_players = self.world.get_nearby_players(npc.position, 100.0)
-                    for player in nearby_players:
-                        client_id = self.character_to_client.get(player.character_id)
-                        if client_id and client_id in self.clients:
-                            await self.clients[client_id].send_packet(npc_packet)
+                    self._send_in_view(candidates_by_chunk, npc.chunk_id, npc.position, npc_packet)
 
             except Exception as e:
                 logger.error(f"Error in network sync loop: {e}")
 
-            await asyncio.sleep(self.network_update_time)
+            next_tick = await self._sleep_until_next_tick(loop, next_tick, self.network_update_time)
+
+    def _send_in_view(self, candidates_by_chunk: Dict, chunk_id: Tuple[int, int],
+                      position: Tuple[float, float, float], packet: Packet,
+                      exclude: Optional[PlayerEntity] = None):
+        """Send packet to every player within view distance of a position in chunk_id"""
+        chunk_candidates = candidates_by_chunk.get(chunk_id)
+        if chunk_candidates is None:
+            candidates = self.world.get_players_around_chunk(chunk_id, VIEW_DISTANCE)
+            positions = np.array([player.position for player in candidates], dtype=np.float64).reshape(-1, 3)
+            chunk_candidates = (candidates, positions)
+            candidates_by_chunk[chunk_id] = chunk_candidates
+
+        candidates, positions = chunk_candidates
+        if not candidates:
+            return
+
+        offsets = positions - position
+        in_range = np.flatnonzero(np.einsum('ij,ij->i', offsets, offsets) <= VIEW_DISTANCE * VIEW_DISTANCE)
+
+        for index in in_range.tolist():
+            player = candidates[index]
+            if player.client is not None and player is not exclude:
+                player.client.send_packet(packet)
+
+    async def _sleep_until_next_tick(self, loop: asyncio.AbstractEventLoop, next_tick: float, interval: float) -> float:
+        """
+        Sleep until the next fixed-rate tick
+
+        Time spent in the loop body is subtracted from the sleep so the
+        rate doesn't drift under load. If a loop falls more than a whole
+        tick behind it resyncs instead of bursting to catch up.
+
+        Returns:
+            Deadline of the tick after this one
+        """
+        next_tick += interval
+        sleep_for = next_tick - loop.time()
+
+        if sleep_for < -interval:
+            next_tick = loop.time()
+
+        await asyncio.sleep(max(0.0, sleep_for))
+        return next_tick
 
     async def handle_respawns(self, current_time: float):
         """Handle player respawns"""
-        respawned = []
-
-        for character_id, respawn_time in self.respawn_queue.items():
-            if current_time >= respawn_time:
-                spawn_pos = get_spawn_position(0)
-                if self.combat.respawn_player(character_id, spawn_pos):
-                    respawned.append(character_id)
+        while self.respawn_queue and self.respawn_queue[0][0] <= current_time:
+            _, character_id = heapq.heappop(self.respawn_queue)
 
-                    # Broadcast respawn
-                    player = self.world.get_player(character_id)
-                    if player:
-                        await self.broadcast_to_all(create_player_spawn(character_id, player.get_stats()))
+            # Skip stale entries, e.g. a player already respawned by an earlier death
+            player = self.world.get_player(character_id)
+            if not player or not player.is_dead:
+                continue
 
-        # Remove from queue
-        for character_id in respawned:
-            del self.respawn_queue[character_id]
+            spawn_pos = get_spawn_position(0)
+            if self.combat.respawn_player(character_id, spawn_pos):
+                # Broadcast respawn
+                self.broadcast_to_all(create_player_spawn(character_id, player.get_stats()))
 
-    async def broadcast_to_nearby(self, character_id: int, packet: Packet, exclude_self: bool = False):
+    def broadcast_to_nearby(self, character_id: int, packet: Packet, exclude_self: bool = False):
         """Broadcast packet to nearby players"""
         player = self.world.get_player(character_id)
         if not player:
             return
 
         nearby_players = self.world.get_visible_players(character_id)
+        data = packet.serialize()
 
         for nearby_player in nearby_players:
-            if exclude_self and nearby_player.character_id == character_id:
+            if exclude_self and nearby_player is player:
                 continue
 
-            client_id = self.character_to_client.get(nearby_player.character_id)
-            if client_id and client_id in self.clients:
-                await self.clients[client_id].send_packet(packet)
+            if nearby_player.client is not None:
+                nearby_player.client.send_data(data)
 
-    async def broadcast_to_all(self, packet: Packet):
+    def broadcast_to_channel(self, channel: str, packet: Packet):
+        """Broadcast packet to players subscribed to a chat channel"""
+        data = packet.serialize()
+
+        for character_id in self.chat_channels.get(channel, ()):
+            client_id = self.character_to_client.get(character_id)
+            if client_id and client_id in self.clients:
+                self.clients[client_id].send_data(data)
+
+    def join_chat_channel(self, character_id: int, channel: str):
+        """Subscribe a player to a chat channel"""
+        if channel not in self.chat_channels:
+            self.chat_channels[channel] = set()
+        self.chat_channels[channel].add(character_id)
+
+    def leave_chat_channels(self, character_id: int):
+        """Unsubscribe a player from every chat channel"""
+        for channel in list(self.chat_channels):
+            subscribers = self.chat_channels[channel]
+            subscribers.discard(character_id)
+            if not subscribers:
+                del self.chat_channels[channel]
+
+    def broadcast_to_all(self, packet: Packet):
         """Broadcast packet to all connected players"""
+        data = packet.serialize()
+
         for client in self.clients.values():
             if client.character_id:
-                await client.send_packet(packet)
+                client.send_data(data)
 
 
 async def main():
@@ -622,5 +765,15 @@ async def main():
         await server.stop()
 
 
+def run():
+    """Run the game server, on uvloop's event loop when it is installed"""
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
+
+
 if __name__ == '__main__':
-    asyncio.run(main())
+    run()
@@ -3,17 +3,30 @@ Subjugate Online - Guild/Clan System
 Manages guilds for territory warfare and social organization
 """
 
-from typing import Dict, List, Optional, Set
+import heapq
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Set, Tuple
 from datetime import datetime
+from shared.constants import GUILD_FLUSH_INTERVAL
 from shared.utils import Logger
 from server.database.db_manager import DatabaseManager
 
 logger = Logger.get_logger(__name__)
 
+# Buffs for characters without a guild
+_EMPTY_BUFFS: Mapping[str, float] = MappingProxyType({
+    'hp_bonus': 0,
+    'attack_bonus': 0,
+    'defense_bonus': 0,
+    'xp_bonus': 0.0
+})
+
 
 class GuildMember:
     """Represents a guild member"""
 
+    __slots__ = ('character_id', 'character_name', 'rank', 'joined_at', 'contribution_points', 'is_online')
+
     def __init__(self, character_id: int, character_name: str, rank: str):
         self.character_id = character_id
         self.character_name = character_name
@@ -26,6 +39,12 @@ class GuildMember:
 class Guild:
     """Represents a guild"""
 
+    __slots__ = (
+        'guild_id', 'name', 'tag', 'level', 'experience', 'members', '_online_ids',
+        'max_members', 'created_at', 'treasury', 'guild_points', 'controlled_territories',
+        '_score', 'bonuses', '_bonuses_frozen'
+    )
+
     def __init__(self, guild_id: int, name: str, leader_id: int, leader_name: str):
         self.guild_id = guild_id
         self.name = name
@@ -33,6 +52,7 @@ class Guild:
         self.level = 1
         self.experience = 0
         self.members: Dict[int, GuildMember] = {}
+        self._online_ids: Set[int] = set()  # Character IDs of online members
         self.max_members = 50
         self.created_at = datetime.utcnow()
 
@@ -43,6 +63,9 @@ class Guild:
         # Territory control
         self.controlled_territories: Set[int] = set()
 
+        # Cached ranking score (None until recomputed)
+        self._score: Optional[int] = None
+
         # Guild bonuses (unlock with guild level)
         self.bonuses = {
             'hp_bonus': 0,
@@ -50,6 +73,7 @@ class Guild:
             'defense_bonus': 0,
             'xp_bonus': 0.0
         }
+        self._bonuses_frozen: Mapping[str, float] = MappingProxyType(dict(self.bonuses))
 
         # Add leader
         leader = GuildMember(leader_id, leader_name, 'leader')
@@ -65,6 +89,7 @@ class Guild:
 
         member = GuildMember(character_id, character_name, 'member')
         self.members[character_id] = member
+        self._score = None
 
         logger.info(f"Player {character_name} joined guild {self.name}")
         return True
@@ -80,6 +105,8 @@ class Guild:
 
         member_name = self.members[character_id].character_name
         del self.members[character_id]
+        self._online_ids.discard(character_id)
+        self._score = None
 
         logger.info(f"Player {member_name} left guild {self.name}")
         return True
@@ -104,9 +131,35 @@ class Guild:
         while self.experience >= xp_needed and self.level < 100:
             self.experience -= xp_needed
             self.level += 1
+            self._score = None
             self._update_guild_bonuses()
             logger.info(f"Guild {self.name} reached level {self.level}!")
 
+    def add_guild_points(self, points: int):
+        """Add guild points"""
+        self.guild_points += points
+        self._score = None
+
+    def set_territory_controlled(self, territory_id: int, controlled: bool):
+        """Add or remove a controlled territory"""
+        if controlled:
+            self.controlled_territories.add(territory_id)
+        else:
+            self.controlled_territories.discard(territory_id)
+        self._score = None
+
+    @property
+    def score(self) -> int:
+        """Ranking score, recomputed only after a change"""
+        if self._score is None:
+            self._score = (
+                self.level * 100 +
+                self.guild_points +
+                len(self.controlled_territories) * 500 +
+                len(self.members) * 10
+            )
+        return self._score
+
     def get_xp_for_next_level(self) -> int:
         """Get XP needed for next guild level"""
         return 1000 * self.level
@@ -117,13 +170,14 @@ class Guild:
         self.bonuses['attack_bonus'] = self.level * 2
         self.bonuses['defense_bonus'] = self.level * 2
         self.bonuses['xp_bonus'] = self.level * 0.01  # 1% per level
+        self._bonuses_frozen = MappingProxyType(dict(self.bonuses))
 
         # Increase max members
         self.max_members = 50 + (self.level * 2)
 
     def get_online_members(self) -> List[GuildMember]:
         """Get all online members"""
-        return [m for m in self.members.values() if m.is_online]
+        return [self.members[character_id] for character_id in self._online_ids]
 
     def get_member_count(self) -> int:
         """Get total member count"""
@@ -131,7 +185,7 @@ class Guild:
 
     def get_online_member_count(self) -> int:
         """Get online member count"""
-        return len(self.get_online_members())
+        return len(self._online_ids)
 
 
 class GuildSystem:
@@ -142,16 +196,67 @@ class GuildSystem:
         self.guilds: Dict[int, Guild] = {}
         self.character_to_guild: Dict[int, int] = {}  # character_id -> guild_id
         self.guild_name_to_id: Dict[str, int] = {}
+        self.territory_to_guild: Dict[int, int] = {}  # territory_id -> guild_id
         self.next_guild_id = 1
 
+        # Write-behind state, flushed to the database in batches
+        self._dirty_guilds: Set[int] = set()
+        self._dirty_members: Set[Tuple[int, int]] = set()  # (guild_id, character_id)
+        self._flush_timer = 0.0
+
         # Load guilds from database
         self._load_guilds()
 
     def _load_guilds(self):
-        """Load guilds from database"""
-        # In production, this would load from database
-        # For now, we'll create guilds dynamically
-        logger.info("Guild system initialized")
+        """Load guilds and their members from database"""
+        guild_rows, member_rows = self.db.load_guild_snapshots()
+
+        members_by_guild: Dict[int, List[Dict]] = {}
+        for row in member_rows:
+            members_by_guild.setdefault(row['guild_id'], []).append(row)
+
+        for row in guild_rows:
+            guild_id = row['id']
+            self.next_guild_id = max(self.next_guild_id, guild_id + 1)
+
+            rows = members_by_guild.get(guild_id)
+            if not rows:
+                # A guild cannot exist without a leader, delete it on the next flush
+                logger.warning(f"Guild {guild_id} has no members, removing it")
+                self._dirty_guilds.add(guild_id)
+                continue
+
+            leader_row = next((r for r in rows if r['rank'] == 'leader'), None)
+            if leader_row is None:
+                leader_row = rows[0]
+                leader_row['rank'] = 'leader'
+                self._dirty_members.add((guild_id, leader_row['character_id']))
+                logger.warning(f"Guild {guild_id} has no leader, promoting {leader_row['character_name']}")
+
+            guild = Guild(guild_id, row['name'], leader_row['character_id'], leader_row['character_name'])
+            guild.tag = row['tag']
+            guild.level = row['level']
+            guild.experience = row['experience']
+            guild.treasury = row['treasury']
+            guild.guild_points = row['guild_points']
+            guild.created_at = row['created_at']
+            if guild.level > 1:
+                guild._update_guild_bonuses()
+
+            for member_row in rows:
+                character_id = member_row['character_id']
+                member = guild.members.get(character_id)
+                if member is None:
+                    member = GuildMember(character_id, member_row['character_name'], member_row['rank'])
+                    guild.members[character_id] = member
+                member.joined_at = member_row['joined_at']
+                member.contribution_points = member_row['contribution_points']
+                self.character_to_guild[character_id] = guild_id
+
+            self.guilds[guild_id] = guild
+            self.guild_name_to_id[guild.name.lower()] = guild_id
+
+        logger.info(f"Guild system initialized with {len(self.guilds)} guilds")
 
     def create_guild(self, leader_id: int, leader_name: str, guild_name: str, guild_tag: str) -> Optional[Guild]:
         """
@@ -172,7 +277,8 @@ class GuildSystem:
             return None
 
         # Check if guild name taken
-        if guild_name.lower() in [g.name.lower() for g in self.guilds.values()]:
+        name_lower = guild_name.lower()
+        if name_lower in self.guild_name_to_id:
             logger.warning(f"Guild name '{guild_name}' already taken")
             return None
 
@@ -190,7 +296,10 @@ class GuildSystem:
 
         self.guilds[guild_id] = guild
         self.character_to_guild[leader_id] = guild_id
-        self.guild_name_to_id[guild_name.lower()] = guild_id
+        self.guild_name_to_id[name_lower] = guild_id
+
+        self._dirty_guilds.add(guild_id)
+        self._dirty_members.add((guild_id, leader_id))
 
         logger.info(f"Guild '{guild_name}' [{guild_tag}] created by {leader_name}")
 
@@ -211,11 +320,16 @@ class GuildSystem:
             if character_id in self.character_to_guild:
                 del self.character_to_guild[character_id]
 
+        # Release controlled territories
+        for territory_id in guild.controlled_territories:
+            self.territory_to_guild.pop(territory_id, None)
+
         # Remove guild
         if guild.name.lower() in self.guild_name_to_id:
             del self.guild_name_to_id[guild.name.lower()]
 
         del self.guilds[guild_id]
+        self._dirty_guilds.add(guild_id)
 
         logger.info(f"Guild '{guild.name}' disbanded")
         return True
@@ -233,6 +347,7 @@ class GuildSystem:
         # Add member
         if guild.add_member(character_id, character_name):
             self.character_to_guild[character_id] = guild_id
+            self._dirty_members.add((guild_id, character_id))
             return True
 
         return False
@@ -250,6 +365,20 @@ class GuildSystem:
         # Remove member
         if guild.remove_member(character_id):
             del self.character_to_guild[character_id]
+            self._dirty_members.add((guild_id, character_id))
+            return True
+
+        return False
+
+    def promote_member(self, character_id: int, new_rank: str) -> bool:
+        """Change the rank of a character within their guild"""
+        guild_id = self.character_to_guild.get(character_id)
+        guild = self.guilds.get(guild_id) if guild_id else None
+        if not guild:
+            return False
+
+        if guild.promote_member(character_id, new_rank):
+            self._dirty_members.add((guild_id, character_id))
             return True
 
         return False
@@ -279,62 +408,147 @@ class GuildSystem:
         guild = self.get_guild_by_character(character_id)
         if guild and character_id in guild.members:
             guild.members[character_id].is_online = is_online
+            if is_online:
+                guild._online_ids.add(character_id)
+            else:
+                guild._online_ids.discard(character_id)
 
     def add_guild_experience(self, guild_id: int, xp: int):
         """Add experience to a guild"""
         guild = self.guilds.get(guild_id)
         if guild:
             guild.add_experience(xp)
+            self._dirty_guilds.add(guild_id)
 
     def update_territory_control(self, territory_id: int, guild_id: Optional[int]):
         """Update territory control for guilds"""
-        # Remove territory from all guilds
-        for guild in self.guilds.values():
-            if territory_id in guild.controlled_territories:
-                guild.controlled_territories.remove(territory_id)
+        # Remove territory from the previous controlling guild
+        old_guild_id = self.territory_to_guild.pop(territory_id, None)
+        if old_guild_id is not None:
+            old_guild = self.guilds.get(old_guild_id)
+            if old_guild:
+                old_guild.set_territory_controlled(territory_id, False)
 
         # Add to new controlling guild
         if guild_id and guild_id in self.guilds:
-            self.guilds[guild_id].controlled_territories.add(territory_id)
+            self.guilds[guild_id].set_territory_controlled(territory_id, True)
+            self.territory_to_guild[territory_id] = guild_id
 
-    def get_guild_buffs(self, character_id: int) -> Dict[str, float]:
-        """Get guild buffs for a character"""
+    def get_guild_buffs(self, character_id: int) -> Mapping[str, float]:
+        """Get guild buffs for a character (read-only)"""
         guild = self.get_guild_by_character(character_id)
         if not guild:
-            return {
-                'hp_bonus': 0,
-                'attack_bonus': 0,
-                'defense_bonus': 0,
-                'xp_bonus': 0.0
-            }
+            return _EMPTY_BUFFS
 
-        return guild.bonuses.copy()
+        return guild._bonuses_frozen
 
     def get_all_guilds(self) -> List[Guild]:
         """Get all guilds"""
         return list(self.guilds.values())
 
-    def get_guild_ranking(self) -> List[tuple]:
+    def get_guild_ranking(self, top_n: Optional[int] = None) -> List[tuple]:
         """
         Get guild ranking by various metrics
 
+        Args:
+            top_n: Only return the N highest ranked guilds (all if None)
+
         Returns:
             List of (guild, score) tuples sorted by score
         """
-        rankings = []
-
-        for guild in self.guilds.values():
-            # Calculate guild score
-            score = (
-                guild.level * 100 +
-                guild.guild_points +
-                len(guild.controlled_territories) * 500 +
-                guild.get_member_count() * 10
-            )
+        if top_n is not None:
+            top_guilds = heapq.nlargest(top_n, self.guilds.values(), key=lambda g: g.score)
+            return [(guild, guild.score) for guild in top_guilds]
 
-            rankings.append((guild, score))
+        rankings = [(guild, guild.score) for guild in self.guilds.values()]
 
         # Sort by score descending
         rankings.sort(key=lambda x: x[1], reverse=True)
 
         return rankings
+
+    # ========================================================================
+    # PERSISTENCE
+    # ========================================================================
+
+    def flush(self, delta_time: float):
+        """
+        Periodically persist pending guild changes
+
+        Args:
+            delta_time: Time since last update in seconds
+        """
+        self._flush_timer += delta_time
+        if self._flush_timer < GUILD_FLUSH_INTERVAL:
+            return
+
+        self._flush_timer = 0.0
+        self.flush_pending()
+
+    def flush_pending(self):
+        """Write all pending guild changes in one batch (also call on shutdown)"""
+        if not self._dirty_guilds and not self._dirty_members:
+            return
+
+        guild_rows = []
+        removed_guild_ids = []
+        for guild_id in self._dirty_guilds:
+            guild = self.guilds.get(guild_id)
+            if not guild:
+                removed_guild_ids.append(guild_id)
+                continue
+
+            guild_rows.append({
+                'id': guild.guild_id,
+                'name': guild.name,
+                'tag': guild.tag,
+                'level': guild.level,
+                'experience': guild.experience,
+                'treasury': guild.treasury,
+                'guild_points': guild.guild_points,
+                'created_at': guild.created_at
+            })
+
+        member_rows = []
+        removed_members = []
+        for guild_id, character_id in self._dirty_members:
+            guild = self.guilds.get(guild_id)
+            member = guild.members.get(character_id) if guild else None
+            if not member:
+                removed_members.append((guild_id, character_id))
+                continue
+
+            member_rows.append({
+                'character_id': character_id,
+                'guild_id': guild_id,
+                'character_name': member.character_name,
+                'rank': member.rank,
+                'contribution_points': member.contribution_points,
+                'joined_at': member.joined_at
+            })
+
+        self._dirty_guilds.clear()
+        self._dirty_members.clear()
+
+        try:
+            self.db.save_guild_snapshots(guild_rows, member_rows, removed_guild_ids, removed_members)
+        except Exception as e:
+            # Retry row by row so one bad row only loses itself
+            logger.error(f"Batched guild save failed, retrying rows individually: {e}")
+            self._save_rows_individually(guild_rows, member_rows, removed_guild_ids, removed_members)
+
+    def _save_rows_individually(self, guild_rows: List[Dict], member_rows: List[Dict],
+                                removed_guild_ids: List[int], removed_members: List[Tuple[int, int]]):
+        """Write each pending guild change in its own transaction, logging and dropping failures"""
+        batches = (
+            [([], [], [guild_id], []) for guild_id in removed_guild_ids] +
+            [([], [], [], [pair]) for pair in removed_members] +
+            [([row], [], [], []) for row in guild_rows] +
+            [([], [row], [], []) for row in member_rows]
+        )
+
+        for batch in batches:
+            try:
+                self.db.save_guild_snapshots(*batch)
+            except Exception as e:
+                logger.error(f"Dropping guild change that failed to save: {e}")
@@ -3,15 +3,61 @@ Subjugate Online - NPC AI System
 Handles NPC behavior, aggro, and combat
 """
 
+import logging
 import time
 import random
-from typing import Optional, Dict, List
-from shared.utils import calculate_distance, normalize_vector, Logger
+from typing import Optional, Dict, List, Tuple
+import numpy as np
+from shared.constants import DamageType, NPCState
+from shared.utils import calculate_damage, calculate_distance_sq, normalize_vector, Logger
 from shared.game_data import NPC_DATABASE, get_npc_data
 from server.game_server.world_manager import NPCEntity, WorldManager
 
 logger = Logger.get_logger(__name__)
 
+# AI distances, squared so range checks can skip the sqrt
+NPC_ATTACK_RANGE_SQ = 2.5 * 2.5
+NPC_LEASH_DISTANCE_SQ = 50.0 * 50.0
+NPC_WANDER_DISTANCE_SQ = 20.0 * 20.0
+NPC_CHASE_SPEED = 4.0  # Slightly slower than players
+NPC_LOOT_DROP_CHANCE = 0.3  # Base drop chance per loot table entry
+
+
+def step_chase(positions: np.ndarray, target_positions: np.ndarray, spawn_positions: np.ndarray,
+               speed: float, delta_time: float):
+    """
+    Advance a batch of chasing NPCs toward their targets
+
+    Args:
+        positions: (N, 3) NPC positions
+        target_positions: (N, 3) target player positions
+        spawn_positions: (N, 3) NPC spawn positions
+        speed: Movement speed in units per second
+        delta_time: Time since last update in seconds
+
+    Returns:
+        (new_positions, new_states); leashed NPCs are snapped back to spawn
+        and go IDLE, NPCs in attack range hold position and go ATTACKING
+    """
+    from_spawn = positions - spawn_positions
+    leashed = np.einsum('ij,ij->i', from_spawn, from_spawn) > NPC_LEASH_DISTANCE_SQ
+    to_target = target_positions - positions
+    in_attack_range = np.einsum('ij,ij->i', to_target, to_target) <= NPC_ATTACK_RANGE_SQ
+
+    # Move along the XZ plane toward the target
+    to_target[:, 1] = 0.0
+    length = np.sqrt(np.einsum('ij,ij->i', to_target, to_target))
+    step = np.divide(speed * delta_time, length, out=np.zeros_like(length), where=length > 0)
+    step = np.where(leashed | in_attack_range, 0.0, step)
+
+    new_positions = np.where(leashed[:, None], spawn_positions, positions + to_target * step[:, None])
+    new_states = np.where(
+        leashed, NPCState.IDLE,
+        np.where(in_attack_range, NPCState.ATTACKING, NPCState.CHASING)
+    )
+
+    return new_positions, new_states
+
 
 class NPCAISystem:
     """Manages NPC AI behavior"""
@@ -19,6 +65,18 @@ class NPCAISystem:
     def __init__(self, world_manager: WorldManager):
         self.world = world_manager
         self.npc_attack_cooldown = 2.0  # NPC attack cooldown in seconds
+        self._debug = False  # Debug logging enabled, sampled once per update()
+        self.loot_arrays: Dict[int, np.ndarray] = {}  # npc_id -> loot table item IDs
+
+        # NPC moves made this tick, applied together at the end of update()
+        self._pending_moves: List[Tuple[int, float, float, float, float]] = []
+
+        # NPC state -> handler(npc, delta_time, current_time); CHASING is batched
+        self.state_handlers = {
+            NPCState.IDLE: self._ai_idle,
+            NPCState.PATROLLING: self._ai_patrol,
+            NPCState.ATTACKING: self._ai_attack
+        }
 
     def update(self, delta_time: float):
         """
@@ -27,66 +85,69 @@ class NPCAISystem:
         Args:
             delta_time: Time since last update in seconds
         """
+        # Single frame timestamp shared by every NPC this tick
         current_time = time.time()
+        self._debug = logger.isEnabledFor(logging.DEBUG)
 
-        for npc in self.world.get_all_npcs():
-            self._update_npc_ai(npc, delta_time, current_time)
-
-    def _update_npc_ai(self, npc: NPCEntity, delta_time: float, current_time: float):
-        """Update individual NPC AI"""
-
-        if npc.hp <= 0:
-            # NPC is dead, don't update
+        # Only NPCs in or next to a chunk with players tick; the rest stay frozen
+        active_chunks = self.world.get_active_chunks()
+        if not active_chunks:
             return
 
-        # State machine
-        if npc.state == 'idle':
-            self._ai_idle(npc, current_time)
+        # Snapshot every state bucket first so each NPC runs one state per tick
+        buckets = [
+            (handler, self.world.get_npcs_in_state(state, active_chunks))
+            for state, handler in self.state_handlers.items()
+        ]
+        chasing = [npc for npc in self.world.get_npcs_in_state(NPCState.CHASING, active_chunks) if npc.hp > 0]
+
+        for handler, npcs in buckets:
+            for npc in npcs:
+                if npc.hp <= 0:
+                    # NPC is dead, don't update
+                    continue
 
-        elif npc.state == 'patrolling':
-            self._ai_patrol(npc, delta_time)
+                handler(npc, delta_time, current_time)
 
-        elif npc.state == 'chasing':
-            self._ai_chase(npc, delta_time, current_time)
+        # Chasing NPCs are moved together in one batch
+        if chasing:
+            self._ai_chase_batch(chasing, delta_time)
 
-        elif npc.state == 'attacking':
-            self._ai_attack(npc, current_time)
+        if self._pending_moves:
+            self.world.batch_update_npc_positions(self._pending_moves, current_time)
+            self._pending_moves.clear()
 
-    def _ai_idle(self, npc: NPCEntity, current_time: float):
+    def _ai_idle(self, npc: NPCEntity, delta_time: float, current_time: float):
         """Idle state - look for targets or start patrolling"""
 
         # Check for nearby players
-        nearby_players = self.world.get_nearby_players(npc.position, npc.aggro_range)
+        target = self.world.find_player_in_range(npc.position, npc.aggro_range)
 
-        if nearby_players:
+        if target:
             # Found a target, start chasing
-            target = nearby_players[0]  # Target first player found
             npc.target_id = target.character_id
-            npc.state = 'chasing'
-            logger.debug(f"NPC {npc.name} (ID: {npc.instance_id}) aggroed {target.name}")
+            self.world.set_npc_state(npc, NPCState.CHASING)
+            if self._debug:
+                logger.debug("NPC %s (ID: %s) aggroed %s", npc.name, npc.instance_id, target.name)
         else:
             # Randomly start patrolling
             if random.random() < 0.1:  # 10% chance per update
-                npc.state = 'patrolling'
+                self.world.set_npc_state(npc, NPCState.PATROLLING)
 
-    def _ai_patrol(self, npc: NPCEntity, delta_time: float):
+    def _ai_patrol(self, npc: NPCEntity, delta_time: float, current_time: float):
         """Patrol state - wander around spawn point"""
 
         # Check for nearby players
-        nearby_players = self.world.get_nearby_players(npc.position, npc.aggro_range)
+        target = self.world.find_player_in_range(npc.position, npc.aggro_range)
 
-        if nearby_players:
+        if target:
             # Found a target, start chasing
-            target = nearby_players[0]
             npc.target_id = target.character_id
-            npc.state = 'chasing'
+            self.world.set_npc_state(npc, NPCState.CHASING)
             return
 
         # Patrol logic - simple random walk around spawn point
-        max_wander_distance = 20.0
-        distance_from_spawn = calculate_distance(npc.position, npc.spawn_position)
-
-        if distance_from_spawn > max_wander_distance:
+        if calculate_distance_sq(npc.position, npc.spawn_position) > NPC_WANDER_DISTANCE_SQ:
             # Return to spawn
             direction = (
                 npc.spawn_position[0] - npc.position[0],
@@ -109,78 +170,60 @@ class NPCAISystem:
         new_y = npc.position[1]
         new_z = npc.position[2] + direction[2] * move_speed * delta_time
 
-        self.world.update_npc_position(npc.instance_id, new_x, new_y, new_z, 0.0)
+        self._pending_moves.append((npc.instance_id, new_x, new_y, new_z, 0.0))
 
         # Randomly go back to idle
         if random.random() < 0.05:  # 5% chance
-            npc.state = 'idle'
+            self.world.set_npc_state(npc, NPCState.IDLE)
 
-    def _ai_chase(self, npc: NPCEntity, delta_time: float, current_time: float):
-        """Chase state - pursue target"""
-
-        if npc.target_id is None:
-            npc.state = 'idle'
-            return
-
-        # Get target
-        target = self.world.get_player(npc.target_id)
+    def _ai_chase_batch(self, npcs: List[NPCEntity], delta_time: float):
+        """Chase state - pursue targets for all chasing NPCs at once"""
 
-        if not target or target.is_dead:
-            # Target lost or dead
-            npc.target_id = None
-            npc.state = 'idle'
-            return
+        chasers = []
+        targets = []
+        for npc in npcs:
+            target = self.world.get_player(npc.target_id) if npc.target_id is not None else None
 
-        # Calculate distance to target
-        distance = calculate_distance(npc.position, target.position)
+            if not target or target.is_dead:
+                # Target lost or dead
+                npc.target_id = None
+                self.world.set_npc_state(npc, NPCState.IDLE)
+                continue
 
-        # Check if too far from spawn (leash)
-        distance_from_spawn = calculate_distance(npc.position, npc.spawn_position)
-        max_leash_distance = 50.0
+            chasers.append(npc)
+            targets.append(target)
 
-        if distance_from_spawn > max_leash_distance:
-            # Too far, reset
-            logger.debug(f"NPC {npc.name} leashed, returning to spawn")
-            npc.target_id = None
-            npc.state = 'idle'
-            npc.hp = npc.max_hp  # Reset HP when leashing
-            self.world.update_npc_position(
-                npc.instance_id,
-                npc.spawn_position[0],
-                npc.spawn_position[1],
-                npc.spawn_position[2],
-                0.0
-            )
+        if not chasers:
             return
 
-        # Check attack range
-        attack_range = 2.5
-        if distance <= attack_range:
-            npc.state = 'attacking'
-            return
+        positions = np.array([npc.position for npc in chasers], dtype=np.float64)
+        target_positions = np.array([target.position for target in targets], dtype=np.float64)
+        spawn_positions = np.array([npc.spawn_position for npc in chasers], dtype=np.float64)
 
-        # Move toward target
-        direction = (
-            target.position[0] - npc.position[0],
-            0,
-            target.position[2] - npc.position[2]
+        new_positions, new_states = step_chase(
+            positions, target_positions, spawn_positions, NPC_CHASE_SPEED, delta_time
         )
 
-        direction = normalize_vector(direction)
+        for npc, position, state in zip(chasers, new_positions.tolist(), new_states.tolist()):
+            self.world.set_npc_state(npc, state)
 
-        # NPC move speed (slightly slower than players)
-        move_speed = 4.0
-        new_x = npc.position[0] + direction[0] * move_speed * delta_time
-        new_y = npc.position[1]
-        new_z = npc.position[2] + direction[2] * move_speed * delta_time
+            if state == NPCState.ATTACKING:
+                continue
 
-        self.world.update_npc_position(npc.instance_id, new_x, new_y, new_z, 0.0)
+            if state == NPCState.IDLE:
+                # Leashed: drop the target and reset HP
+                if self._debug:
+                    logger.debug("NPC %s leashed, returning to spawn", npc.name)
+                npc.target_id = None
+                npc.hp = npc.max_hp
 
-    def _ai_attack(self, npc: NPCEntity, current_time: float):
+            self._pending_moves.append((npc.instance_id, position[0], position[1], position[2], 0.0))
+
+    def _ai_attack(self, npc: NPCEntity, delta_time: float, current_time: float):
         """Attack state - attack target"""
 
         if npc.target_id is None:
-            npc.state = 'idle'
+            self.world.set_npc_state(npc, NPCState.IDLE)
             return
 
         # Get target
@@ -188,16 +231,13 @@ class NPCAISystem:
 
         if not target or target.is_dead:
             npc.target_id = None
-            npc.state = 'idle'
+            self.world.set_npc_state(npc, NPCState.IDLE)
             return
 
         # Check distance
-        distance = calculate_distance(npc.position, target.position)
-        attack_range = 2.5
-
-        if distance > attack_range:
+        if calculate_distance_sq(npc.position, target.position) > NPC_ATTACK_RANGE_SQ:
             # Target moved away, chase
-            npc.state = 'chasing'
+            self.world.set_npc_state(npc, NPCState.CHASING)
             return
 
         # Check attack cooldown
@@ -209,9 +249,6 @@ class NPCAISystem:
 
     def _npc_attack_player(self, npc: NPCEntity, target, current_time: float):
         """NPC attacks a player"""
-        from shared.utils import calculate_damage
-        from shared.constants import DamageType
-
         attacker_stats = {
             'attack': npc.attack,
             'level': npc.level
@@ -229,7 +266,9 @@ class NPCAISystem:
 
         npc.last_attack_time = current_time
 
-        logger.debug(f"NPC {npc.name} attacked {target.name} for {damage} damage (HP: {target.hp}/{target.max_hp})")
+        if self._debug:
+            logger.debug("NPC %s attacked %s for %s damage (HP: %s/%s)",
+                         npc.name, target.name, damage, target.hp, target.max_hp)
 
     def spawn_npc(self, npc_id: int, position: tuple) -> Optional[NPCEntity]:
         """
@@ -272,12 +311,12 @@ class NPCAISystem:
             count = config['count']
             area = config['area']  # (min_x, max_x, min_z, max_z)
 
-            for _ in range(count):
-                x = random.uniform(area[0], area[1])
-                z = random.uniform(area[2], area[3])
-                position = (x, 0.0, z)
+            # Draw all spawn positions for this config at once
+            xs = np.random.uniform(area[0], area[1], count)
+            zs = np.random.uniform(area[2], area[3], count)
 
-                self.spawn_npc(npc_id, position)
+            for x, z in zip(xs.tolist(), zs.tolist()):
+                self.spawn_npc(npc_id, (x, 0.0, z))
 
         logger.info(f"Spawned initial NPCs: {self.world.get_npc_count()} total")
 
@@ -330,12 +369,14 @@ class NPCAISystem:
         Returns:
             List of item IDs
         """
-        loot = []
+        loot_ids = self.loot_arrays.get(npc.npc_id)
+        if loot_ids is None:
+            loot_ids = np.asarray(npc.loot_table, dtype=np.int32)
+            self.loot_arrays[npc.npc_id] = loot_ids
 
-        # Each item in loot table has a chance to drop
-        for item_id in npc.loot_table:
-            drop_chance = 0.3  # 30% base drop chance
-            if random.random() < drop_chance:
-                loot.append(item_id)
+        if not loot_ids.size:
+            return []
 
-        return loot
+        # Each item in loot table has a chance to drop, drawn in one call
+        dropped = np.random.random(loot_ids.size) < NPC_LOOT_DROP_CHANCE
+        return loot_ids[dropped].tolist()
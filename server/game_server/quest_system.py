@@ -4,7 +4,8 @@ Advanced quest system with daily quests, achievements, and dynamic objectives
 """
 
 import random
-from typing import Dict, List, Optional, Any
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime, timedelta
 from shared.utils import Logger
 from server.database.db_manager import DatabaseManager
@@ -13,30 +14,23 @@ logger = Logger.get_logger(__name__)
 
 
 class QuestObjective:
-    """Represents a quest objective"""
+    """Represents a quest objective (progress is tracked per player in ActiveQuest)"""
 
     def __init__(self, objective_type: str, target: Any, required: int):
         self.objective_type = objective_type  # 'kill', 'collect', 'reach_level', 'capture_territory'
         self.target = target  # NPC ID, item ID, level, etc.
         self.required = required  # Amount required
-        self.current = 0  # Current progress
-
-    def is_complete(self) -> bool:
-        """Check if objective is complete"""
-        return self.current >= self.required
-
-    def update_progress(self, amount: int = 1):
-        """Update objective progress"""
-        self.current = min(self.current + amount, self.required)
-
-    def get_progress_percentage(self) -> float:
-        """Get progress as percentage"""
-        return (self.current / self.required) * 100.0 if self.required > 0 else 100.0
 
 
 class Quest:
     """Represents a quest"""
 
+    __slots__ = (
+        'quest_id', 'name', 'description', 'quest_type', 'min_level', 'objectives',
+        'xp_reward', 'gold_reward', 'legacy_points_reward', 'item_rewards',
+        'is_repeatable', 'cooldown_time'
+    )
+
     def __init__(
         self,
         quest_id: int,
@@ -52,12 +46,12 @@ class Quest:
         self.min_level = min_level
 
         self.objectives: List[QuestObjective] = []
-        self.rewards = {
-            'xp': 0,
-            'gold': 0,
-            'items': [],  # List of item IDs
-            'legacy_points': 0  # For reincarnation
-        }
+
+        # Rewards
+        self.xp_reward = 0
+        self.gold_reward = 0
+        self.legacy_points_reward = 0  # For reincarnation
+        self.item_rewards: List[int] = []  # List of item IDs
 
         self.is_repeatable = quest_type in ['daily', 'weekly']
         self.cooldown_time = None  # For repeatable quests
@@ -66,31 +60,59 @@ class Quest:
         """Add an objective to the quest"""
         self.objectives.append(objective)
 
-    def is_complete(self) -> bool:
-        """Check if all objectives are complete"""
-        return all(obj.is_complete() for obj in self.objectives)
-
-    def get_incomplete_objectives(self) -> List[QuestObjective]:
-        """Get incomplete objectives"""
-        return [obj for obj in self.objectives if not obj.is_complete()]
+    def get_rewards(self) -> Dict[str, Any]:
+        """Get quest rewards as a dictionary"""
+        return {
+            'xp': self.xp_reward,
+            'gold': self.gold_reward,
+            'items': list(self.item_rewards),
+            'legacy_points': self.legacy_points_reward
+        }
 
 
 class ActiveQuest:
     """Represents an active quest for a player"""
 
     def __init__(self, quest: Quest):
-        self.quest = quest
+        self.quest = quest  # Shared quest definition, never modified
+        self.progress: List[int] = [0] * len(quest.objectives)  # Per objective
+        self._incomplete_count = sum(1 for obj in quest.objectives if obj.required > 0)
         self.started_at = datetime.utcnow()
         self.completed_at: Optional[datetime] = None
         self.turned_in = False
 
+    def advance_objective(self, index: int, amount: int = 1):
+        """Update progress on one of the quest's objectives"""
+        required = self.quest.objectives[index].required
+        current = self.progress[index]
+        if current >= required:
+            return
+
+        current = min(current + amount, required)
+        self.progress[index] = current
+        if current >= required:
+            self._incomplete_count -= 1
+
+    def is_complete(self) -> bool:
+        """Check if all objectives are complete"""
+        return self._incomplete_count == 0
+
+    def get_incomplete_objectives(self) -> List[QuestObjective]:
+        """Get incomplete objectives"""
+        return [obj for obj, current in zip(self.quest.objectives, self.progress) if current < obj.required]
+
+    def get_progress_percentage(self, index: int) -> float:
+        """Get an objective's progress as percentage"""
+        required = self.quest.objectives[index].required
+        return (self.progress[index] / required) * 100.0 if required > 0 else 100.0
+
     def mark_complete(self):
         """Mark quest as complete"""
         self.completed_at = datetime.utcnow()
 
     def turn_in(self):
         """Turn in completed quest"""
-        if self.quest.is_complete():
+        if self.is_complete():
             self.turned_in = True
             return True
         return False
@@ -102,12 +124,21 @@ class QuestSystem:
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
         self.quests: Dict[int, Quest] = {}
-        self.player_quests: Dict[int, List[ActiveQuest]] = {}  # character_id -> active quests
-        self.player_completed: Dict[int, List[int]] = {}  # character_id -> completed quest IDs
+        self.player_quests: Dict[int, Dict[int, ActiveQuest]] = {}  # character_id -> {quest_id: active quest}
+        self.player_completed: Dict[int, bytearray] = {}  # character_id -> bitmap, bit N = quest N completed
+
+        # character_id -> {(objective_type, target): [(active quest, objective index)]}
+        self.objective_index: Dict[int, Dict[Tuple[str, Any], List[Tuple[ActiveQuest, int]]]] = {}
         self.next_quest_id = 1
 
+        # Quest indexes sorted by min_level, built once from self.quests
+        self.quests_by_level: List[Quest] = []
+        self.quests_by_type: Dict[str, List[Quest]] = {}
+        self._level_keys: Dict[Optional[str], List[int]] = {}  # quest_type (None = all) -> sorted min levels
+
         # Initialize quest database
         self._initialize_quests()
+        self._build_quest_indexes()
 
     def _initialize_quests(self):
         """Initialize quest database with starter quests"""
@@ -120,8 +151,8 @@ class QuestSystem:
             min_level=1
         )
         quest.add_objective(QuestObjective('kill', 'any', 1))
-        quest.rewards['xp'] = 50
-        quest.rewards['gold'] = 10
+        quest.xp_reward = 50
+        quest.gold_reward = 10
         self.quests[1] = quest
 
         # === DAILY QUESTS ===
@@ -133,9 +164,9 @@ class QuestSystem:
             min_level=1
         )
         quest.add_objective(QuestObjective('kill', 'monster', 20))
-        quest.rewards['xp'] = 500
-        quest.rewards['gold'] = 100
-        quest.rewards['legacy_points'] = 10
+        quest.xp_reward = 500
+        quest.gold_reward = 100
+        quest.legacy_points_reward = 10
         self.quests[100] = quest
 
         quest = Quest(
@@ -146,9 +177,9 @@ class QuestSystem:
             min_level=10
         )
         quest.add_objective(QuestObjective('pvp_kill', 'player', 3))
-        quest.rewards['xp'] = 1000
-        quest.rewards['gold'] = 200
-        quest.rewards['legacy_points'] = 25
+        quest.xp_reward = 1000
+        quest.gold_reward = 200
+        quest.legacy_points_reward = 25
         self.quests[101] = quest
 
         # === TERRITORY QUESTS ===
@@ -160,8 +191,8 @@ class QuestSystem:
             min_level=15
         )
         quest.add_objective(QuestObjective('capture_territory', 'any', 1))
-        quest.rewards['xp'] = 2000
-        quest.rewards['legacy_points'] = 50
+        quest.xp_reward = 2000
+        quest.legacy_points_reward = 50
         self.quests[200] = quest
 
         # === BOSS QUESTS ===
@@ -173,10 +204,10 @@ class QuestSystem:
             min_level=45
         )
         quest.add_objective(QuestObjective('kill_boss', 6001, 1))  # Dragon Lord ID
-        quest.rewards['xp'] = 10000
-        quest.rewards['gold'] = 5000
-        quest.rewards['legacy_points'] = 100
-        quest.rewards['items'] = [1003]  # Legendary Blade
+        quest.xp_reward = 10000
+        quest.gold_reward = 5000
+        quest.legacy_points_reward = 100
+        quest.item_rewards = [1003]  # Legendary Blade
         self.quests[300] = quest
 
         # === REINCARNATION QUESTS ===
@@ -189,30 +220,75 @@ class QuestSystem:
         )
         quest.add_objective(QuestObjective('reach_level', 100, 1))
         quest.add_objective(QuestObjective('reincarnate', 1, 1))
-        quest.rewards['legacy_points'] = 500
+        quest.legacy_points_reward = 500
         self.quests[400] = quest
 
         logger.info(f"Quest system initialized with {len(self.quests)} quests")
 
+    def _build_quest_indexes(self):
+        """Build per-type quest buckets sorted by minimum level"""
+        self.quests_by_level = sorted(self.quests.values(), key=lambda q: q.min_level)
+        self._level_keys = {None: [q.min_level for q in self.quests_by_level]}
+
+        self.quests_by_type = {}
+        for quest in self.quests_by_level:
+            self.quests_by_type.setdefault(quest.quest_type, []).append(quest)
+
+        for quest_type, quests in self.quests_by_type.items():
+            self._level_keys[quest_type] = [q.min_level for q in quests]
+
+        # Completion bitmaps are sized to cover every known quest ID
+        self._completed_bitmap_size = (max(self.quests, default=0) >> 3) + 1
+
+        # Scratch copy of the daily bucket, partially shuffled in place when picking
+        self._daily_pick_buffer = list(self.quests_by_type.get('daily', []))
+
+    def _has_completed(self, character_id: int, quest_id: int) -> bool:
+        """Check a character's completion bitmap for a quest"""
+        bitmap = self.player_completed.get(character_id)
+        byte_index = quest_id >> 3
+        if bitmap is None or byte_index >= len(bitmap):
+            return False
+
+        return bool((bitmap[byte_index] >> (quest_id & 7)) & 1)
+
+    def _mark_completed(self, character_id: int, quest_id: int):
+        """Set a quest's bit in a character's completion bitmap"""
+        bitmap = self.player_completed.get(character_id)
+        if bitmap is None:
+            bitmap = self.player_completed[character_id] = bytearray(self._completed_bitmap_size)
+
+        byte_index = quest_id >> 3
+        if byte_index >= len(bitmap):
+            bitmap.extend(bytes(byte_index + 1 - len(bitmap)))
+
+        bitmap[byte_index] |= 1 << (quest_id & 7)
+
+    def _get_quests_for_level(self, character_level: int, quest_type: Optional[str] = None) -> List[Quest]:
+        """Get quests (optionally of one type) whose level requirement is met"""
+        if quest_type is None:
+            quests = self.quests_by_level
+        else:
+            quests = self.quests_by_type.get(quest_type, [])
+
+        level_keys = self._level_keys.get(quest_type, [])
+        return quests[:bisect_right(level_keys, character_level)]
+
     def get_available_quests(self, character_id: int, character_level: int) -> List[Quest]:
         """Get available quests for a character"""
         available = []
 
-        # Get player's active and completed quests
-        active_quest_ids = [aq.quest.quest_id for aq in self.player_quests.get(character_id, [])]
-        completed_quest_ids = self.player_completed.get(character_id, [])
+        # Get player's active quests
+        active_quest_ids = self.player_quests.get(character_id, {})
 
-        for quest in self.quests.values():
+        # Only quests whose level requirement is met
+        for quest in self._get_quests_for_level(character_level):
             # Check if already active
             if quest.quest_id in active_quest_ids:
                 continue
 
             # Check if already completed (and not repeatable)
-            if not quest.is_repeatable and quest.quest_id in completed_quest_ids:
-                continue
-
-            # Check level requirement
-            if character_level < quest.min_level:
+            if not quest.is_repeatable and self._has_completed(character_id, quest.quest_id):
                 continue
 
             available.append(quest)
@@ -227,37 +303,43 @@ class QuestSystem:
 
         # Initialize player quest tracking if needed
         if character_id not in self.player_quests:
-            self.player_quests[character_id] = []
+            self.player_quests[character_id] = {}
 
         # Check if already active
-        if any(aq.quest.quest_id == quest_id for aq in self.player_quests[character_id]):
+        if quest_id in self.player_quests[character_id]:
             return False
 
-        # Accept quest (create a fresh instance)
-        active_quest = ActiveQuest(self._create_quest_instance(quest))
-        self.player_quests[character_id].append(active_quest)
+        # Accept quest (progress starts at zero, the definition is shared)
+        active_quest = ActiveQuest(quest)
+        self.player_quests[character_id][quest_id] = active_quest
+        self._index_objectives(character_id, active_quest)
 
         logger.info(f"Character {character_id} accepted quest {quest.name}")
         return True
 
-    def _create_quest_instance(self, quest: Quest) -> Quest:
-        """Create a fresh instance of a quest with new objectives"""
-        new_quest = Quest(
-            quest.quest_id,
-            quest.name,
-            quest.description,
-            quest.quest_type,
-            quest.min_level
-        )
-        new_quest.rewards = quest.rewards.copy()
-        new_quest.is_repeatable = quest.is_repeatable
-
-        # Copy objectives
-        for obj in quest.objectives:
-            new_obj = QuestObjective(obj.objective_type, obj.target, obj.required)
-            new_quest.add_objective(new_obj)
-
-        return new_quest
+    def _index_objectives(self, character_id: int, active_quest: ActiveQuest):
+        """Register an active quest's objectives under their (type, target) key"""
+        index = self.objective_index.setdefault(character_id, {})
+        for i, objective in enumerate(active_quest.quest.objectives):
+            key = (objective.objective_type, objective.target)
+            index.setdefault(key, []).append((active_quest, i))
+
+    def _unindex_objectives(self, character_id: int, active_quest: ActiveQuest):
+        """Remove an active quest's objectives from the objective index"""
+        index = self.objective_index.get(character_id)
+        if not index:
+            return
+
+        for objective in active_quest.quest.objectives:
+            key = (objective.objective_type, objective.target)
+            entries = [entry for entry in index.get(key, ()) if entry[0] is not active_quest]
+            if entries:
+                index[key] = entries
+            else:
+                index.pop(key, None)
+
+        if not index:
+            del self.objective_index[character_id]
 
     def abandon_quest(self, character_id: int, quest_id: int) -> bool:
         """Abandon a quest"""
@@ -265,13 +347,14 @@ class QuestSystem:
             return False
 
         # Find and remove quest
-        for i, active_quest in enumerate(self.player_quests[character_id]):
-            if active_quest.quest.quest_id == quest_id:
-                del self.player_quests[character_id][i]
-                logger.info(f"Character {character_id} abandoned quest {quest_id}")
-                return True
+        active_quest = self.player_quests[character_id].pop(quest_id, None)
+        if active_quest is None:
+            return False
 
-        return False
+        self._unindex_objectives(character_id, active_quest)
+
+        logger.info(f"Character {character_id} abandoned quest {quest_id}")
+        return True
 
     def update_quest_progress(
         self,
@@ -292,29 +375,31 @@ class QuestSystem:
         Returns:
             List of quests that were completed
         """
-        if character_id not in self.player_quests:
+        index = self.objective_index.get(character_id)
+        if not index:
             return []
 
-        completed_quests = []
+        # Objectives matching this exact target, or any target
+        keys = {(event_type, target), (event_type, 'any')}
+
+        # Special case: 'kill' also counts for 'monster'
+        if event_type == 'kill':
+            keys.add(('kill', 'monster'))
 
-        for active_quest in self.player_quests[character_id]:
-            if active_quest.completed_at:
-                continue  # Already complete
+        updated_quests: Dict[int, ActiveQuest] = {}
+        for key in keys:
+            for active_quest, objective_index in index.get(key, ()):
+                if active_quest.completed_at:
+                    continue  # Already complete
 
-            # Update objectives
-            for objective in active_quest.quest.objectives:
-                # Check if objective matches event
-                if objective.objective_type == event_type:
-                    # Check target match
-                    if objective.target == 'any' or objective.target == target:
-                        objective.update_progress(amount)
+                active_quest.advance_objective(objective_index, amount)
+                updated_quests[active_quest.quest.quest_id] = active_quest
 
-                        # Special case: 'kill' also counts for 'monster'
-                        if event_type == 'kill' and objective.target == 'monster':
-                            objective.update_progress(amount)
+        completed_quests = []
 
+        for active_quest in updated_quests.values():
             # Check if quest complete
-            if active_quest.quest.is_complete() and not active_quest.completed_at:
+            if active_quest.is_complete():
                 active_quest.mark_complete()
                 completed_quests.append(active_quest.quest)
                 logger.info(f"Character {character_id} completed quest {active_quest.quest.name}")
@@ -332,37 +417,36 @@ class QuestSystem:
             return None
 
         # Find completed quest
-        for i, active_quest in enumerate(self.player_quests[character_id]):
-            if active_quest.quest.quest_id == quest_id:
-                if not active_quest.quest.is_complete():
-                    return None
-
-                if active_quest.turned_in:
-                    return None
+        active_quests = self.player_quests[character_id]
+        active_quest = active_quests.get(quest_id)
+        if not active_quest:
+            return None
 
-                # Turn in quest
-                active_quest.turn_in()
+        if not active_quest.is_complete():
+            return None
 
-                # Track completion
-                if character_id not in self.player_completed:
-                    self.player_completed[character_id] = []
+        if active_quest.turned_in:
+            return None
 
-                if quest_id not in self.player_completed[character_id]:
-                    self.player_completed[character_id].append(quest_id)
+        # Turn in quest
+        active_quest.turn_in()
 
-                # Remove from active quests
-                del self.player_quests[character_id][i]
+        # Track completion
+        self._mark_completed(character_id, quest_id)
 
-                logger.info(f"Character {character_id} turned in quest {active_quest.quest.name}")
+        # Remove from active quests
+        del active_quests[quest_id]
+        self._unindex_objectives(character_id, active_quest)
 
-                # Return rewards
-                return active_quest.quest.rewards
+        logger.info(f"Character {character_id} turned in quest {active_quest.quest.name}")
 
-        return None
+        # Return rewards
+        return active_quest.quest.get_rewards()
 
     def get_active_quests(self, character_id: int) -> List[ActiveQuest]:
         """Get character's active quests"""
-        return self.player_quests.get(character_id, [])
+        active_quests = self.player_quests.get(character_id)
+        return list(active_quests.values()) if active_quests else []
 
     def get_quest_by_id(self, quest_id: int) -> Optional[Quest]:
         """Get quest by ID"""
@@ -370,13 +454,23 @@ class QuestSystem:
 
     def generate_daily_quests(self, character_level: int) -> List[Quest]:
         """Generate random daily quests based on character level"""
-        daily_quests = []
-
-        # Get all daily quest templates
-        daily_templates = [q for q in self.quests.values() if q.quest_type == 'daily']
-
-        # Filter by level
-        available = [q for q in daily_templates if character_level >= q.min_level]
-
-        # Return up to 3 daily quests
-        return random.sample(available, min(3, len(available)))
+        # Daily quest templates the character is high enough level for form a
+        # prefix of the level-sorted daily bucket
+        buffer = self._daily_pick_buffer
+        eligible = bisect_right(self._level_keys.get('daily', []), character_level)
+        count = min(3, eligible)
+
+        # Partial Fisher-Yates over the eligible prefix picks up to 3 daily quests
+        swaps = []
+        for i in range(count):
+            j = random.randrange(i, eligible)
+            buffer[i], buffer[j] = buffer[j], buffer[i]
+            swaps.append(j)
+        picked = buffer[:count]
+
+        # Undo the swaps so the buffer stays sorted by minimum level
+        for i in range(count - 1, -1, -1):
+            j = swaps[i]
+            buffer[i], buffer[j] = buffer[j], buffer[i]
+
+        return picked
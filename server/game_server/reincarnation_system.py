@@ -3,9 +3,11 @@ Subjugate Online - Reincarnation System
 Handles character reincarnation and perk calculation
 """
 
-from typing import Optional, Dict, Any
+import time
+from functools import lru_cache
+from typing import Optional, Dict, Any, Tuple
 from shared.constants import (
-    REINCARNATION_LEVEL_REQUIREMENT, MAX_REINCARNATIONS, ErrorCode
+    REINCARNATION_LEVEL_REQUIREMENT, MAX_REINCARNATIONS, REINCARNATION_PREVIEW_TTL, ErrorCode
 )
 from shared.utils import calculate_success_score, calculate_reincarnation_perks, Logger
 from server.database.db_manager import DatabaseManager
@@ -13,12 +15,34 @@ from server.database.db_manager import DatabaseManager
 logger = Logger.get_logger(__name__)
 
 
+@lru_cache(maxsize=1024)
+def _score_and_perks(level: int, total_kills: int, boss_kills: int, territory_control_time: int,
+                     playtime: int, reincarnation_count: int) -> Tuple[float, Tuple[Tuple[str, Any], ...]]:
+    """Memoized success score and perk items for a set of life statistics"""
+    success_score = calculate_success_score({
+        'level': level,
+        'total_kills': total_kills,
+        'boss_kills': boss_kills,
+        'territory_control_time': territory_control_time,
+        'playtime': playtime
+    })
+    perks = calculate_reincarnation_perks(reincarnation_count, success_score)
+    return success_score, tuple(perks.items())
+
+
 class ReincarnationSystem:
     """Manages character reincarnation"""
 
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
 
+        # character_id -> (computed_at, preview) for polled previews
+        self._preview_cache: Dict[int, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+    def invalidate_preview(self, character_id: int):
+        """Drop a cached preview after the character's stats change"""
+        self._preview_cache.pop(character_id, None)
+
     def can_reincarnate(self, character_id: int) -> tuple[bool, str]:
         """
         Check if a character can reincarnate
@@ -26,7 +50,10 @@ class ReincarnationSystem:
         Returns:
             (can_reincarnate, reason)
         """
-        character = self.db.get_character_by_id(character_id)
+        return self._check_character(self.db.get_character_by_id(character_id))
+
+    def _check_character(self, character) -> tuple[bool, str]:
+        """Check reincarnation requirements for an already loaded character"""
         if not character:
             return False, "Character not found"
 
@@ -48,29 +75,19 @@ class ReincarnationSystem:
             Reincarnation result with perks, or None if failed
         """
         # Check if can reincarnate
-        can_reincarnate, reason = self.can_reincarnate(character_id)
+        character = self.db.get_character_by_id(character_id)
+        can_reincarnate, reason = self._check_character(character)
         if not can_reincarnate:
             logger.warning(f"Reincarnation failed for character {character_id}: {reason}")
             return None
 
-        character = self.db.get_character_by_id(character_id)
-        if not character:
-            return None
-
-        # Calculate success score based on previous life
-        character_data = {
-            'level': character.level,
-            'total_kills': character.total_kills,
-            'boss_kills': character.boss_kills,
-            'territory_control_time': character.territory_control_time,
-            'playtime': character.playtime
-        }
-
-        success_score = calculate_success_score(character_data)
-
-        # Calculate new perks
+        # Calculate success score and new perks based on previous life
         new_reincarnation_count = character.reincarnation_count + 1
-        new_perks = calculate_reincarnation_perks(new_reincarnation_count, success_score)
+        success_score, perk_items = _score_and_perks(
+            character.level, character.total_kills, character.boss_kills,
+            character.territory_control_time, character.playtime, new_reincarnation_count
+        )
+        new_perks = dict(perk_items)
 
         # Merge with existing perks (perks stack)
         current_perks = character.reincarnation_perks
@@ -90,6 +107,8 @@ class ReincarnationSystem:
             logger.error(f"Failed to reincarnate character {character_id} in database")
             return None
 
+        self.invalidate_preview(character_id)
+
         logger.info(f"Character {character.name} reincarnated! Count: {new_reincarnation_count}, Score: {success_score:.2f}")
 
         return {
@@ -114,28 +133,28 @@ class ReincarnationSystem:
         Returns:
             Preview data or None if cannot reincarnate
         """
-        can_reincarnate, reason = self.can_reincarnate(character_id)
+        now = time.time()
+        cached = self._preview_cache.get(character_id)
+        if cached and now - cached[0] < REINCARNATION_PREVIEW_TTL:
+            return cached[1]
+
+        preview = self._build_preview(self.db.get_character_by_id(character_id))
+        self._preview_cache[character_id] = (now, preview)
+        return preview
+
+    def _build_preview(self, character) -> Optional[Dict[str, Any]]:
+        """Build preview data for a loaded character"""
+        can_reincarnate, reason = self._check_character(character)
         if not can_reincarnate:
             return None
 
-        character = self.db.get_character_by_id(character_id)
-        if not character:
-            return None
-
-        # Calculate success score
-        character_data = {
-            'level': character.level,
-            'total_kills': character.total_kills,
-            'boss_kills': character.boss_kills,
-            'territory_control_time': character.territory_control_time,
-            'playtime': character.playtime
-        }
-
-        success_score = calculate_success_score(character_data)
-
-        # Calculate potential perks
+        # Calculate success score and potential perks
         new_reincarnation_count = character.reincarnation_count + 1
-        new_perks = calculate_reincarnation_perks(new_reincarnation_count, success_score)
+        success_score, perk_items = _score_and_perks(
+            character.level, character.total_kills, character.boss_kills,
+            character.territory_control_time, character.playtime, new_reincarnation_count
+        )
+        new_perks = dict(perk_items)
 
         return {
             'current_level': character.level,
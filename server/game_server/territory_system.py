@@ -4,16 +4,28 @@ Manages territory capture and buffs (Conquer Online inspired)
 """
 
 import time
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+import numpy as np
 from shared.constants import (
-    TERRITORY_UPDATE_INTERVAL, TERRITORY_CAPTURE_TIME,
+    TERRITORY_UPDATE_INTERVAL, TERRITORY_CAPTURE_TIME, TERRITORY_FLUSH_INTERVAL,
     MIN_PLAYERS_TO_CAPTURE, TERRITORY_BUFFS, TerritoryType
 )
-from shared.utils import calculate_distance, Logger
+from shared.utils import Logger
 from shared.game_data import TERRITORY_DATABASE, get_territory_data
 
 logger = Logger.get_logger(__name__)
 
+# Buffs for characters that control no territory
+_EMPTY_BUFFS: Mapping[str, float] = MappingProxyType({
+    'hp_bonus': 0,
+    'attack_bonus': 0,
+    'defense_bonus': 0,
+    'xp_bonus': 0.0
+})
+
 
 class TerritoryState:
     """Represents the state of a territory"""
@@ -23,8 +35,16 @@ class TerritoryState:
         self.name = territory_data['name']
         self.position = territory_data['position']
         self.radius = territory_data['radius']
+        self.radius_sq = self.radius * self.radius
         self.capture_points_required = territory_data['capture_points_required']
 
+        # Static buffs, resolved once
+        self.buffs = TERRITORY_BUFFS.get(territory_id, {})
+        self.hp_bonus = self.buffs.get('hp_bonus', 0)
+        self.attack_bonus = self.buffs.get('attack_bonus', 0)
+        self.defense_bonus = self.buffs.get('defense_bonus', 0)
+        self.xp_bonus = self.buffs.get('xp_bonus', 0.0)
+
         # Control state
         self.controller_id: Optional[int] = None
         self.controller_name: Optional[str] = None
@@ -35,9 +55,15 @@ class TerritoryState:
         self.capturing_player_id: Optional[int] = None
         self.capture_start_time = 0.0
 
+        # Bumped whenever control or capture state changes, for status diffs
+        self.version = 0
+
+        # Character IDs of players currently inside the territory
+        self.active_players: Set[int] = set()
+
     def get_buffs(self) -> Dict[str, Any]:
         """Get buffs provided by this territory"""
-        return TERRITORY_BUFFS.get(self.territory_id, {})
+        return self.buffs
 
     def is_being_captured(self) -> bool:
         """Check if territory is currently being captured"""
@@ -64,9 +90,42 @@ class TerritorySystem:
         for territory_id, territory_data in TERRITORY_DATABASE.items():
             self.territories[territory_id] = TerritoryState(territory_id, territory_data)
 
+        # Territory centers and squared radii for vectorized containment tests
+        self._territory_list: List[TerritoryState] = list(self.territories.values())
+        self._territory_centers = np.array([t.position for t in self._territory_list], dtype=np.float64).reshape(-1, 3)
+        self._territory_radius_sq = np.array([t.radius_sq for t in self._territory_list], dtype=np.float64)
+
+        # Territory IDs per controlling character and their summed buffs
+        self.territories_by_owner: Dict[int, Set[int]] = {}
+        self._buffs_by_owner: Dict[int, Mapping[str, float]] = {}
+
+        # One status dict per territory, refreshed in place by get_territory_status
+        self._status_buffer: List[Dict] = [
+            {
+                'territory_id': territory.territory_id,
+                'name': territory.name,
+                'controller_id': None,
+                'controller_name': None,
+                'capture_points': 0,
+                'is_being_captured': False,
+                'capture_progress': 0.0,
+                'buffs': territory.buffs,
+                'version': -1
+            }
+            for territory in self._territory_list
+        ]
+
+        # Write-behind state, flushed to the database in batches
+        self._dirty_territories: Set[int] = set()
+        self._event_queue: deque = deque()
+        self._flush_timer = 0.0
+
         # Load territory control from database
         self._load_territory_control()
 
+        for controller_id in self.territories_by_owner:
+            self._recompute_buffs_for(controller_id)
+
         logger.info(f"TerritorySystem initialized with {len(self.territories)} territories")
 
     def _load_territory_control(self):
@@ -78,6 +137,7 @@ class TerritorySystem:
                 territory.controller_id = control.controller_character_id
                 territory.controller_name = control.controller_name
                 territory.capture_points = control.capture_points
+                self.territories_by_owner.setdefault(territory.controller_id, set()).add(territory_id)
 
     def update(self, delta_time: float):
         """
@@ -88,28 +148,53 @@ class TerritorySystem:
         """
         current_time = time.time()
 
+        self._update_occupancy()
+
         for territory in self.territories.values():
+            # Nothing can change for an empty territory with no capture running
+            if not territory.active_players and not territory.is_being_captured():
+                continue
+
             # Check for players in territory
             players_in_territory = self._get_players_in_territory(territory)
 
+            controller_id = territory.controller_id
+
+            # Only the controller is defending: nobody can capture, so drop any stale attempt
+            if not any(player.character_id != controller_id for player in players_in_territory):
+                if territory.is_being_captured():
+                    logger.info(f"Capture of {territory.name} interrupted (no challengers left)")
+                    territory.capturing_player_id = None
+                    territory.capture_start_time = 0.0
+                    territory.version += 1
+                continue
+
             if len(players_in_territory) >= MIN_PLAYERS_TO_CAPTURE:
+                # Kept in locals and refreshed whenever this loop changes them
+                capturing_id = territory.capturing_player_id
+
                 # Check if any player is trying to capture
                 for player in players_in_territory:
+                    character_id = player.character_id
+
                     # Skip if player is already controller
-                    if player.character_id == territory.controller_id:
+                    if character_id == controller_id:
                         continue
 
                     # Start capture if not already capturing
-                    if not territory.is_being_captured():
-                        territory.capturing_player_id = player.character_id
+                    if capturing_id is None:
+                        territory.capturing_player_id = capturing_id = character_id
                         territory.capture_start_time = current_time
+                        territory.version += 1
                         logger.info(f"{player.name} started capturing {territory.name}")
 
                     # Check if capture is complete
-                    elif territory.capturing_player_id == player.character_id:
+                    elif capturing_id == character_id:
                         progress = territory.get_capture_progress(current_time)
                         if progress >= 1.0:
-                            self._capture_territory(territory, player.character_id, player.name)
+                            self._capture_territory(territory, character_id, player.name, current_time)
+                            controller_id = character_id
+                            capturing_id = None
 
             else:
                 # Reset capture attempt if not enough players
@@ -117,22 +202,76 @@ class TerritorySystem:
                     logger.info(f"Capture of {territory.name} interrupted (not enough players)")
                     territory.capturing_player_id = None
                     territory.capture_start_time = 0.0
+                    territory.version += 1
+
+        self._flush_timer += delta_time
+        if self._flush_timer >= TERRITORY_FLUSH_INTERVAL:
+            self._flush_timer = 0.0
+            self.flush_pending()
+
+    def flush_pending(self):
+        """Write pending territory control changes and events in one batch (also call on shutdown)"""
+        if not self._dirty_territories and not self._event_queue:
+            return
+
+        control_rows = []
+        for territory_id in self._dirty_territories:
+            territory = self.territories[territory_id]
+            control_rows.append({
+                'territory_id': territory_id,
+                'controller_character_id': territory.controller_id,
+                'controller_name': territory.controller_name,
+                'captured_at': datetime.utcfromtimestamp(territory.last_capture_time) if territory.controller_id else None,
+                'capture_points': 0
+            })
+
+        events = list(self._event_queue)
+
+        self.db.set_territory_controls_bulk(control_rows)
+        self.db.log_events_bulk(events)
+
+        self._dirty_territories.clear()
+        self._event_queue.clear()
+
+    def _update_occupancy(self):
+        """Move players that changed position since the last update in or out of territories"""
+        moved_ids = self.world.pop_moved_players()
+        if not moved_ids:
+            return
+
+        # Removed players get a position that is never inside a territory
+        positions = np.full((len(moved_ids), 3), np.inf)
+        for i, character_id in enumerate(moved_ids):
+            player = self.world.get_player(character_id)
+            if player:
+                positions[i] = player.position
+
+        # (players, territories) containment matrix in one pass
+        offsets = positions[:, None, :] - self._territory_centers[None, :, :]
+        inside = np.einsum('ijk,ijk->ij', offsets, offsets) <= self._territory_radius_sq
+
+        for j, territory in enumerate(self._territory_list):
+            active_players = territory.active_players
+            for character_id, is_inside in zip(moved_ids, inside[:, j].tolist()):
+                if is_inside:
+                    active_players.add(character_id)
+                else:
+                    active_players.discard(character_id)
 
     def _get_players_in_territory(self, territory: TerritoryState) -> List:
-        """Get all players currently in a territory"""
+        """Get all living players currently in a territory"""
         players_in_territory = []
+        get_player = self.world.players.get
 
-        for player in self.world.get_all_players():
-            if player.is_dead:
-                continue
-
-            distance = calculate_distance(player.position, territory.position)
-            if distance <= territory.radius:
+        for character_id in territory.active_players:
+            player = get_player(character_id)
+            if player and not player.is_dead:
                 players_in_territory.append(player)
 
         return players_in_territory
 
-    def _capture_territory(self, territory: TerritoryState, character_id: int, character_name: str):
+    def _capture_territory(self, territory: TerritoryState, character_id: int, character_name: str,
+                           current_time: float):
         """
         Capture a territory
 
@@ -140,38 +279,52 @@ class TerritorySystem:
             territory: Territory to capture
             character_id: Capturing player ID
             character_name: Capturing player name
+            current_time: Tick timestamp from update()
         """
         old_controller = territory.controller_name
+        old_controller_id = territory.controller_id
 
         territory.controller_id = character_id
         territory.controller_name = character_name
         territory.capture_points = territory.capture_points_required
-        territory.last_capture_time = time.time()
+        territory.last_capture_time = current_time
         territory.capturing_player_id = None
         territory.capture_start_time = 0.0
-
-        # Update database
-        self.db.set_territory_control(territory.territory_id, character_id, character_name)
-
-        # Log event
-        self.db.log_event('territory_captured', character_id, {
-            'territory_id': territory.territory_id,
-            'territory_name': territory.name,
-            'previous_controller': old_controller
+        territory.version += 1
+
+        # Move the territory between owners and refresh both cached buff totals
+        if old_controller_id is not None:
+            owned = self.territories_by_owner.get(old_controller_id)
+            if owned is not None:
+                owned.discard(territory.territory_id)
+                if not owned:
+                    del self.territories_by_owner[old_controller_id]
+            self._recompute_buffs_for(old_controller_id)
+        self.territories_by_owner.setdefault(character_id, set()).add(territory.territory_id)
+        self._recompute_buffs_for(character_id)
+
+        # Queue the database writes for the next flush
+        self._dirty_territories.add(territory.territory_id)
+        self._event_queue.append({
+            'event_type': 'territory_captured',
+            'character_id': character_id,
+            'details': {
+                'territory_id': territory.territory_id,
+                'territory_name': territory.name,
+                'previous_controller': old_controller
+            },
+            'timestamp': datetime.utcnow()
         })
 
         logger.info(f"Territory captured! {territory.name} now controlled by {character_name}")
 
-    def get_territory_buffs_for_player(self, character_id: int) -> Dict[str, int]:
-        """
-        Get all territory buffs for a player
+    def _recompute_buffs_for(self, character_id: int):
+        """Recompute the summed buffs of every territory a character controls"""
+        owned = self.territories_by_owner.get(character_id)
+        if not owned:
+            self._buffs_by_owner.pop(character_id, None)
+            return
 
-        Args:
-            character_id: Player character ID
-
-        Returns:
-            Dictionary of buff totals
-        """
         total_buffs = {
             'hp_bonus': 0,
             'attack_bonus': 0,
@@ -179,16 +332,26 @@ class TerritorySystem:
             'xp_bonus': 0.0
         }
 
-        # Check each territory
-        for territory in self.territories.values():
-            if territory.controller_id == character_id:
-                buffs = territory.get_buffs()
-                total_buffs['hp_bonus'] += buffs.get('hp_bonus', 0)
-                total_buffs['attack_bonus'] += buffs.get('attack_bonus', 0)
-                total_buffs['defense_bonus'] += buffs.get('defense_bonus', 0)
-                total_buffs['xp_bonus'] += buffs.get('xp_bonus', 0.0)
+        for territory_id in owned:
+            territory = self.territories[territory_id]
+            total_buffs['hp_bonus'] += territory.hp_bonus
+            total_buffs['attack_bonus'] += territory.attack_bonus
+            total_buffs['defense_bonus'] += territory.defense_bonus
+            total_buffs['xp_bonus'] += territory.xp_bonus
+
+        self._buffs_by_owner[character_id] = MappingProxyType(total_buffs)
+
+    def get_territory_buffs_for_player(self, character_id: int) -> Mapping[str, float]:
+        """
+        Get all territory buffs for a player
 
-        return total_buffs
+        Args:
+            character_id: Player character ID
+
+        Returns:
+            Read-only mapping of buff totals
+        """
+        return self._buffs_by_owner.get(character_id, _EMPTY_BUFFS)
 
     def apply_territory_buffs_to_player(self, player_entity, character_id: int):
         """
@@ -208,21 +371,35 @@ class TerritorySystem:
         if buffs['hp_bonus'] > 0 or buffs['attack_bonus'] > 0:
             logger.debug(f"Applied territory buffs to {player_entity.name}: {buffs}")
 
-    def get_territory_status(self) -> List[Dict]:
-        """Get status of all territories"""
+    def get_territory_status(self, known_versions: Optional[Dict[int, int]] = None) -> List[Dict]:
+        """
+        Get status of all territories
+
+        The returned dicts are reused between calls, so serialize them
+        before the next call.
+
+        Args:
+            known_versions: Optional territory_id -> version already sent;
+                only territories with a newer version are returned
+
+        Returns:
+            List of territory status dicts
+        """
         status = []
+        now = time.time()
 
-        for territory in self.territories.values():
-            status.append({
-                'territory_id': territory.territory_id,
-                'name': territory.name,
-                'controller_id': territory.controller_id,
-                'controller_name': territory.controller_name,
-                'capture_points': territory.capture_points,
-                'is_being_captured': territory.is_being_captured(),
-                'capture_progress': territory.get_capture_progress(time.time()) if territory.is_being_captured() else 0.0,
-                'buffs': territory.get_buffs()
-            })
+        for territory, entry in zip(self._territory_list, self._status_buffer):
+            if known_versions is not None and territory.version <= known_versions.get(territory.territory_id, -1):
+                continue
+
+            being_captured = territory.is_being_captured()
+            entry['controller_id'] = territory.controller_id
+            entry['controller_name'] = territory.controller_name
+            entry['capture_points'] = territory.capture_points
+            entry['is_being_captured'] = being_captured
+            entry['capture_progress'] = territory.get_capture_progress(now) if being_captured else 0.0
+            entry['version'] = territory.version
+            status.append(entry)
 
         return status
 
@@ -5,7 +5,8 @@ Dynamic server-wide events that affect gameplay
 
 import random
 import time
-from typing import Dict, List, Optional, Any, Callable
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any, Callable
 from datetime import datetime, timedelta
 from shared.utils import Logger
 
@@ -41,24 +42,31 @@ class WorldEvent:
         self.on_end: Optional[Callable] = None
         self.on_update: Optional[Callable] = None
 
-    def start(self):
-        """Start the event"""
+    def start(self, now: Optional[float] = None):
+        """Start the event (now defaults to the current time)"""
         if self.is_active:
             return
 
+        if now is None:
+            now = time.time()
+
         self.is_active = True
-        self.start_time = time.time()
-        self.last_activation = time.time()
+        self.start_time = now
+        self.last_activation = now
 
         if self.on_start:
             self.on_start()
 
         logger.info(f"World Event Started: {self.name}")
 
-    def update(self, delta_time: float) -> bool:
+    def update(self, delta_time: float, now: Optional[float] = None) -> bool:
         """
         Update the event
 
+        Args:
+            delta_time: Time since last update in seconds
+            now: Tick timestamp (defaults to the current time)
+
         Returns:
             True if event should end
         """
@@ -68,8 +76,11 @@ class WorldEvent:
         if self.on_update:
             self.on_update(delta_time)
 
+        if now is None:
+            now = time.time()
+
         # Check if duration expired
-        elapsed = time.time() - self.start_time
+        elapsed = now - self.start_time
         if elapsed >= self.duration:
             return True
 
@@ -87,25 +98,30 @@ class WorldEvent:
 
         logger.info(f"World Event Ended: {self.name}")
 
-    def can_activate(self) -> bool:
-        """Check if event can be activated"""
+    def can_activate(self, now: Optional[float] = None) -> bool:
+        """Check if event can be activated (now defaults to the current time)"""
         if self.is_active:
             return False
 
         # Check cooldown
         if self.last_activation > 0:
-            time_since = time.time() - self.last_activation
+            if now is None:
+                now = time.time()
+            time_since = now - self.last_activation
             if time_since < self.cooldown:
                 return False
 
         return True
 
-    def get_time_remaining(self) -> float:
-        """Get time remaining in seconds"""
+    def get_time_remaining(self, now: Optional[float] = None) -> float:
+        """Get time remaining in seconds (now defaults to the current time)"""
         if not self.is_active:
             return 0.0
 
-        elapsed = time.time() - self.start_time
+        if now is None:
+            now = time.time()
+
+        elapsed = now - self.start_time
         return max(0, self.duration - elapsed)
 
 
@@ -117,10 +133,15 @@ class WorldEventsSystem:
         self.npc_ai = npc_ai_system
 
         self.events: Dict[int, WorldEvent] = {}
-        self.active_events: List[WorldEvent] = []
+        self.active_events: Dict[int, WorldEvent] = {}  # event_id -> running event
+
+        # Combined effects of the active events, rebuilt only after an event starts or ends
+        self._effects_cache: Mapping[str, Any] = MappingProxyType({})
+        self._effects_dirty = False
 
         # Event scheduling
-        self.next_random_event_time = time.time() + random.uniform(1800, 3600)  # 30-60 min
+        self.current_tick_time = time.time()  # Timestamp of the latest update()
+        self.next_random_event_time = self.current_tick_time + random.uniform(1800, 3600)  # 30-60 min
 
         # Initialize events
         self._initialize_events()
@@ -218,32 +239,37 @@ class WorldEventsSystem:
 
     def update(self, delta_time: float):
         """Update world events"""
-        current_time = time.time()
+        current_time = self.current_tick_time = time.time()
 
         # Update active events
-        for event in list(self.active_events):
-            should_end = event.update(delta_time)
+        for event in list(self.active_events.values()):
+            should_end = event.update(delta_time, current_time)
 
             if should_end:
                 event.end()
-                self.active_events.remove(event)
+                del self.active_events[event.event_id]
+                self._effects_dirty = True
 
         # Check for random event trigger
         if current_time >= self.next_random_event_time:
-            self._trigger_random_event()
+            self._trigger_random_event(current_time)
             self.next_random_event_time = current_time + random.uniform(1800, 3600)
 
-    def start_event(self, event_id: int) -> bool:
-        """Start a specific event"""
+    def start_event(self, event_id: int, now: Optional[float] = None) -> bool:
+        """Start a specific event (now defaults to the current time)"""
         event = self.events.get(event_id)
         if not event:
             return False
 
-        if not event.can_activate():
+        if now is None:
+            now = time.time()
+
+        if not event.can_activate(now):
             return False
 
-        event.start()
-        self.active_events.append(event)
+        event.start(now)
+        self.active_events[event.event_id] = event
+        self._effects_dirty = True
 
         return True
 
@@ -254,20 +280,23 @@ class WorldEventsSystem:
             return False
 
         event.end()
-        if event in self.active_events:
-            self.active_events.remove(event)
+        if self.active_events.pop(event_id, None) is not None:
+            self._effects_dirty = True
 
         return True
 
     def get_active_events(self) -> List[WorldEvent]:
         """Get all active events"""
-        return self.active_events.copy()
+        return list(self.active_events.values())
+
+    def get_event_effects(self) -> Mapping[str, Any]:
+        """Get combined effects from all active events (read-only, cached between event changes)"""
+        if not self._effects_dirty:
+            return self._effects_cache
 
-    def get_event_effects(self) -> Dict[str, Any]:
-        """Get combined effects from all active events"""
         combined_effects = {}
 
-        for event in self.active_events:
+        for event in self.active_events.values():
             for effect_name, effect_value in event.effects.items():
                 if effect_name in combined_effects:
                     # Multiply multipliers
@@ -278,19 +307,21 @@ class WorldEventsSystem:
                 else:
                     combined_effects[effect_name] = effect_value
 
-        return combined_effects
+        self._effects_cache = MappingProxyType(combined_effects)
+        self._effects_dirty = False
+        return self._effects_cache
 
-    def _trigger_random_event(self):
+    def _trigger_random_event(self, now: float):
         """Trigger a random event"""
         # Get events that can be activated
-        available_events = [e for e in self.events.values() if e.can_activate()]
+        available_events = [e for e in self.events.values() if e.can_activate(now)]
 
         if not available_events:
             return
 
         # Random selection
         event = random.choice(available_events)
-        self.start_event(event.event_id)
+        self.start_event(event.event_id, now)
 
     # ========================================================================
     # EVENT-SPECIFIC HANDLERS
@@ -350,28 +381,34 @@ class DayNightCycle:
 
         self.current_weather = 'clear'
         self.weather_change_interval = 600.0  # 10 minutes
-        self.last_weather_change = time.time()
+        self.last_weather_change = self.start_time
+
+    def update(self, delta_time: float, now: Optional[float] = None):
+        """Update day/night cycle and weather (now defaults to the current time)"""
+        if now is None:
+            now = time.time()
 
-    def update(self, delta_time: float):
-        """Update day/night cycle and weather"""
         # Check for weather change
-        if time.time() - self.last_weather_change >= self.weather_change_interval:
+        if now - self.last_weather_change >= self.weather_change_interval:
             self._change_weather()
-            self.last_weather_change = time.time()
+            self.last_weather_change = now
 
-    def get_time_of_day(self) -> float:
+    def get_time_of_day(self, now: Optional[float] = None) -> float:
         """Get time of day (0.0 - 1.0)"""
-        elapsed = time.time() - self.start_time
+        if now is None:
+            now = time.time()
+
+        elapsed = now - self.start_time
         return (elapsed % self.cycle_duration) / self.cycle_duration
 
-    def is_night(self) -> bool:
+    def is_night(self, now: Optional[float] = None) -> bool:
         """Check if it's night time"""
-        time_of_day = self.get_time_of_day()
+        time_of_day = self.get_time_of_day(now)
         return time_of_day < 0.25 or time_of_day > 0.75  # Night from 6pm-6am
 
-    def get_light_level(self) -> float:
+    def get_light_level(self, now: Optional[float] = None) -> float:
         """Get ambient light level (0.0 - 1.0)"""
-        time_of_day = self.get_time_of_day()
+        time_of_day = self.get_time_of_day(now)
 
         # Noon = 1.0, Midnight = 0.3
         if time_of_day < 0.5:
@@ -3,10 +3,12 @@ Subjugate Online - World Manager
 Manages world state, spatial partitioning, and entity tracking
 """
 
+import math
 import time
 from typing import Dict, List, Set, Tuple, Optional
-from shared.constants import CHUNK_SIZE, VIEW_DISTANCE, WORLD_SIZE
-from shared.utils import get_chunk_id, get_surrounding_chunks, calculate_distance, Logger
+import numpy as np
+from shared.constants import CHUNK_SIZE, VIEW_DISTANCE, WORLD_SIZE, NPCState
+from shared.utils import get_chunk_id, Logger
 
 logger = Logger.get_logger(__name__)
 
@@ -14,6 +16,8 @@ logger = Logger.get_logger(__name__)
 class Entity:
     """Base entity class"""
 
+    __slots__ = ('id', 'type', 'position', 'rotation', 'chunk_id', 'last_update')
+
     def __init__(self, entity_id: int, entity_type: str, position: Tuple[float, float, float]):
         self.id = entity_id
         self.type = entity_type  # 'player', 'npc', etc.
@@ -37,6 +41,13 @@ class Entity:
 class PlayerEntity(Entity):
     """Player entity with additional data"""
 
+    __slots__ = (
+        'character_id', 'name', 'level', 'hp', 'max_hp', 'mp', 'max_mp',
+        'attack', 'defense', 'speed', 'game_mode', 'reincarnation_count',
+        'reincarnation_perks', 'is_dead', 'target_id', 'last_attack_time',
+        'active_buffs', 'velocity', 'client'
+    )
+
     def __init__(self, character_id: int, character_data: dict):
         position = (
             character_data.get('position_x', 100.0),
@@ -68,6 +79,9 @@ class PlayerEntity(Entity):
         # Movement
         self.velocity = (0.0, 0.0, 0.0)
 
+        # Connection this player is controlled from, set by the game server
+        self.client = None
+
     def get_stats(self) -> dict:
         """Get player stats"""
         return {
@@ -114,6 +128,12 @@ class PlayerEntity(Entity):
 class NPCEntity(Entity):
     """NPC entity"""
 
+    __slots__ = (
+        'instance_id', 'npc_id', 'name', 'npc_type', 'level', 'hp', 'max_hp',
+        'attack', 'defense', 'xp_reward', 'loot_table', 'aggro_range', 'skills',
+        'state', 'target_id', 'spawn_position', 'last_attack_time'
+    )
+
     def __init__(self, instance_id: int, npc_data: dict, position: Tuple[float, float, float]):
         super().__init__(instance_id, 'npc', position)
 
@@ -131,8 +151,8 @@ class NPCEntity(Entity):
         self.aggro_range = npc_data.get('aggro_range', 5.0)
         self.skills = npc_data.get('skills', [])
 
-        # AI state
-        self.state = 'idle'  # idle, patrolling, chasing, attacking
+        # AI state (change through WorldManager.set_npc_state to keep the state index in sync)
+        self.state = NPCState.IDLE
         self.target_id = None
         self.spawn_position = position
         self.last_attack_time = 0.0
@@ -162,6 +182,42 @@ class NPCEntity(Entity):
         return self.hp == 0
 
 
+class PositionTable:
+    """Entity positions mirrored into one contiguous array, one row per entity"""
+
+    def __init__(self, capacity: int = 256):
+        self.positions = np.zeros((capacity, 3), dtype=np.float64)
+        self.rows: Dict[int, int] = {}  # entity ID -> row
+        self.ids: List[int] = []  # row -> entity ID
+
+    def set(self, entity_id: int, position: Tuple[float, float, float]):
+        """Add an entity or overwrite its position"""
+        row = self.rows.get(entity_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.positions):
+                grown = np.zeros((row * 2, 3), dtype=np.float64)
+                grown[:row] = self.positions
+                self.positions = grown
+            self.rows[entity_id] = row
+            self.ids.append(entity_id)
+
+        self.positions[row] = position
+
+    def remove(self, entity_id: int):
+        """Remove an entity, moving the last row into its place"""
+        row = self.rows.pop(entity_id, None)
+        if row is None:
+            return
+
+        last_id = self.ids.pop()
+        if last_id != entity_id:
+            last_row = len(self.ids)
+            self.positions[row] = self.positions[last_row]
+            self.ids[row] = last_id
+            self.rows[last_id] = row
+
+
 class WorldManager:
     """Manages world state and entity tracking with spatial partitioning"""
 
@@ -173,8 +229,29 @@ class WorldManager:
         self.player_chunks: Dict[Tuple[int, int], Set[int]] = {}
         self.npc_chunks: Dict[Tuple[int, int], Set[int]] = {}
 
+        # Positions mirrored into arrays for vectorized range queries
+        self.player_positions = PositionTable()
+        self.npc_positions = PositionTable()
+
+        # Players that moved since the last network sync
+        self.dirty_players: Set[int] = set()
+
+        # Players added, moved or removed since the last territory update
+        self.moved_players: Set[int] = set()
+
+        # NPC instance IDs bucketed by AI state
+        self.npcs_by_state: Dict[int, Set[int]] = {
+            NPCState.IDLE: set(),
+            NPCState.PATROLLING: set(),
+            NPCState.CHASING: set(),
+            NPCState.ATTACKING: set()
+        }
+
         self.next_npc_instance_id = 1
 
+        # Chunk search radius -> (dx, dz) offsets of every chunk it covers
+        self._neighbor_offsets_cache: Dict[int, Tuple[Tuple[int, int], ...]] = {}
+
         logger.info("WorldManager initialized")
 
     # ========================================================================
@@ -188,6 +265,8 @@ class WorldManager:
 
         # Add to spatial partition
         self._add_to_chunk(player.chunk_id, character_id, self.player_chunks)
+        self.player_positions.set(character_id, player.position)
+        self.moved_players.add(character_id)
 
         logger.info(f"Player added to world: {player.name} (ID: {character_id})")
         return player
@@ -198,6 +277,9 @@ class WorldManager:
         if player:
             # Remove from spatial partition
             self._remove_from_chunk(player.chunk_id, character_id, self.player_chunks)
+            self.player_positions.remove(character_id)
+            self.dirty_players.discard(character_id)
+            self.moved_players.add(character_id)
 
             del self.players[character_id]
             logger.info(f"Player removed from world: {player.name} (ID: {character_id})")
@@ -210,9 +292,15 @@ class WorldManager:
         """Update player position"""
         player = self.players.get(character_id)
         if player:
+            if player.position == (x, y, z) and player.rotation == rotation:
+                return
+
             old_chunk = player.chunk_id
 
             player.update_position(x, y, z, rotation)
+            self.player_positions.set(character_id, player.position)
+            self.dirty_players.add(character_id)
+            self.moved_players.add(character_id)
 
             # Update chunk if changed
             if player.chunk_id != old_chunk:
@@ -221,22 +309,85 @@ class WorldManager:
 
     def get_nearby_players(self, position: Tuple[float, float, float], radius: float) -> List[PlayerEntity]:
         """Get all players within radius of a position"""
-        chunk_id = get_chunk_id(position, CHUNK_SIZE)
-        search_radius = int(radius / CHUNK_SIZE) + 1
-        nearby_chunks = get_surrounding_chunks(chunk_id, search_radius)
+        cx, cz = get_chunk_id(position, CHUNK_SIZE)
+        offsets = self._neighbor_offsets(self._chunk_search_radius(radius))
 
-        nearby_players = []
+        candidate_ids = []
 
-        for chunk in nearby_chunks:
-            player_ids = self.player_chunks.get(chunk, set())
+        for dx, dz in offsets:
+            player_ids = self.player_chunks.get((cx + dx, cz + dz))
+            if player_ids:
+                candidate_ids.extend(player_ids)
+
+        return self._filter_in_radius(self.player_positions, candidate_ids, self.players, position, radius)
+
+    def find_player_in_range(self, position: Tuple[float, float, float], radius: float) -> Optional[PlayerEntity]:
+        """Get the first player found within radius of a position, if any"""
+        if not self.players:
+            return None
+
+        cx, cz = get_chunk_id(position, CHUNK_SIZE)
+        offsets = self._neighbor_offsets(self._chunk_search_radius(radius))
+        x, y, z = position
+        radius_sq = radius * radius
+
+        for ox, oz in offsets:
+            player_ids = self.player_chunks.get((cx + ox, cz + oz))
+            if not player_ids:
+                continue
             for player_id in player_ids:
                 player = self.players.get(player_id)
                 if player:
-                    distance = calculate_distance(position, player.position)
-                    if distance <= radius:
-                        nearby_players.append(player)
+                    px, py, pz = player.position
+                    dx, dy, dz = px - x, py - y, pz - z
+                    if dx*dx + dy*dy + dz*dz <= radius_sq:
+                        return player
+
+        return None
+
+    def get_active_chunks(self, halo: int = 1) -> Set[Tuple[int, int]]:
+        """Get chunks containing a player, plus `halo` rings of neighbouring chunks"""
+        offsets = self._neighbor_offsets(halo)
+        active_chunks = set()
+        for cx, cz in self.player_chunks:
+            active_chunks.update([(cx + dx, cz + dz) for dx, dz in offsets])
+        return active_chunks
+
+    def get_players_around_chunk(self, chunk_id: Tuple[int, int], radius: float) -> List[PlayerEntity]:
+        """
+        Get candidate players for anything inside a chunk
 
-        return nearby_players
+        Returns every player in the chunks a radius query from chunk_id can
+        reach, without the exact distance check, so callers with many
+        entities in the same chunk only walk the chunk grid once.
+        """
+        cx, cz = chunk_id
+        offsets = self._neighbor_offsets(self._chunk_search_radius(radius))
+
+        candidates = []
+
+        for dx, dz in offsets:
+            player_ids = self.player_chunks.get((cx + dx, cz + dz))
+            if not player_ids:
+                continue
+            for player_id in player_ids:
+                player = self.players.get(player_id)
+                if player:
+                    candidates.append(player)
+
+        return candidates
+
+    def pop_dirty_players(self) -> List[PlayerEntity]:
+        """Get players that moved since the last call and clear the dirty set"""
+        dirty_players = [self.players[character_id] for character_id in self.dirty_players]
+        self.dirty_players.clear()
+        return dirty_players
+
+    def pop_moved_players(self) -> List[int]:
+        """Get IDs of players added, moved or removed since the last call and clear the set"""
+        moved_players = list(self.moved_players)
+        self.moved_players.clear()
+        return moved_players
 
     def get_visible_players(self, character_id: int) -> List[PlayerEntity]:
         """Get all players visible to a character"""
@@ -260,6 +411,8 @@ class WorldManager:
 
         # Add to spatial partition
         self._add_to_chunk(npc.chunk_id, instance_id, self.npc_chunks)
+        self.npc_positions.set(instance_id, position)
+        self.npcs_by_state[npc.state].add(instance_id)
 
         logger.info(f"NPC spawned: {npc.name} (Instance ID: {instance_id})")
         return npc
@@ -270,6 +423,8 @@ class WorldManager:
         if npc:
             # Remove from spatial partition
             self._remove_from_chunk(npc.chunk_id, instance_id, self.npc_chunks)
+            self.npc_positions.remove(instance_id)
+            self.npcs_by_state[npc.state].discard(instance_id)
 
             del self.npcs[instance_id]
             logger.info(f"NPC removed: {npc.name} (Instance ID: {instance_id})")
@@ -278,6 +433,24 @@ class WorldManager:
         """Get an NPC by instance ID"""
         return self.npcs.get(instance_id)
 
+    def set_npc_state(self, npc: NPCEntity, state: int):
+        """Change an NPC's AI state and move it to the matching state bucket"""
+        if npc.state == state:
+            return
+
+        self.npcs_by_state[npc.state].discard(npc.instance_id)
+        self.npcs_by_state[state].add(npc.instance_id)
+        npc.state = state
+
+    def get_npcs_in_state(self, state: int, chunks: Optional[Set[Tuple[int, int]]] = None) -> List[NPCEntity]:
+        """Get NPCs currently in an AI state, optionally only those inside the given chunks"""
+        npcs = self.npcs
+        state_npcs = [npcs[instance_id] for instance_id in self.npcs_by_state[state]]
+        if chunks is None:
+            return state_npcs
+
+        return [npc for npc in state_npcs if npc.chunk_id in chunks]
+
     def update_npc_position(self, instance_id: int, x: float, y: float, z: float, rotation: float):
         """Update NPC position"""
         npc = self.npcs.get(instance_id)
@@ -285,30 +458,58 @@ class WorldManager:
             old_chunk = npc.chunk_id
 
             npc.update_position(x, y, z, rotation)
+            self.npc_positions.set(instance_id, npc.position)
 
             # Update chunk if changed
             if npc.chunk_id != old_chunk:
                 self._remove_from_chunk(old_chunk, instance_id, self.npc_chunks)
                 self._add_to_chunk(npc.chunk_id, instance_id, self.npc_chunks)
 
+    def batch_update_npc_positions(self, moves: List[Tuple[int, float, float, float, float]],
+                                   timestamp: Optional[float] = None):
+        """Apply many (instance_id, x, y, z, rotation) NPC moves with one timestamp"""
+        now = timestamp if timestamp is not None else time.time()
+        npcs = self.npcs
+        npc_chunks = self.npc_chunks
+        position_rows = self.npc_positions.rows
+        moved_rows = []
+        moved_positions = []
+
+        for instance_id, x, y, z, rotation in moves:
+            npc = npcs.get(instance_id)
+            if not npc:
+                continue
+
+            old_chunk = npc.chunk_id
+            npc.position = (x, y, z)
+            npc.rotation = rotation
+            npc.chunk_id = get_chunk_id(npc.position, CHUNK_SIZE)
+            npc.last_update = now
+            moved_rows.append(position_rows[instance_id])
+            moved_positions.append(npc.position)
+
+            # Update chunk if changed
+            if npc.chunk_id != old_chunk:
+                self._remove_from_chunk(old_chunk, instance_id, npc_chunks)
+                self._add_to_chunk(npc.chunk_id, instance_id, npc_chunks)
+
+        # Mirror all moved positions in one assignment
+        if moved_rows:
+            self.npc_positions.positions[moved_rows] = moved_positions
+
     def get_nearby_npcs(self, position: Tuple[float, float, float], radius: float) -> List[NPCEntity]:
         """Get all NPCs within radius of a position"""
-        chunk_id = get_chunk_id(position, CHUNK_SIZE)
-        search_radius = int(radius / CHUNK_SIZE) + 1
-        nearby_chunks = get_surrounding_chunks(chunk_id, search_radius)
+        cx, cz = get_chunk_id(position, CHUNK_SIZE)
+        offsets = self._neighbor_offsets(self._chunk_search_radius(radius))
 
-        nearby_npcs = []
+        candidate_ids = []
 
-        for chunk in nearby_chunks:
-            npc_ids = self.npc_chunks.get(chunk, set())
-            for npc_id in npc_ids:
-                npc = self.npcs.get(npc_id)
-                if npc:
-                    distance = calculate_distance(position, npc.position)
-                    if distance <= radius:
-                        nearby_npcs.append(npc)
+        for dx, dz in offsets:
+            npc_ids = self.npc_chunks.get((cx + dx, cz + dz))
+            if npc_ids:
+                candidate_ids.extend(npc_ids)
 
-        return nearby_npcs
+        return self._filter_in_radius(self.npc_positions, candidate_ids, self.npcs, position, radius)
 
     def get_visible_npcs(self, character_id: int) -> List[NPCEntity]:
         """Get all NPCs visible to a character"""
@@ -322,6 +523,36 @@ class WorldManager:
     # SPATIAL PARTITIONING HELPERS
     # ========================================================================
 
+    def _chunk_search_radius(self, radius: float) -> int:
+        """Get how many chunks around an entity's chunk a radius can reach"""
+        # Chunk ids truncate toward zero, so chunk 0 is twice as wide and
+        # ceil() is always enough
+        return max(1, math.ceil(radius / CHUNK_SIZE))
+
+    def _filter_in_radius(self, table: PositionTable, entity_ids: List[int], entities: Dict,
+                          position: Tuple[float, float, float], radius: float) -> List:
+        """Get the entities among entity_ids within radius of a position, using one vectorized squared-distance test"""
+        if not entity_ids:
+            return []
+
+        rows = table.rows
+        offsets = table.positions[[rows[entity_id] for entity_id in entity_ids]] - position
+        in_range = np.flatnonzero(np.einsum('ij,ij->i', offsets, offsets) <= radius * radius)
+
+        return [entities[entity_ids[index]] for index in in_range.tolist()]
+
+    def _neighbor_offsets(self, search_radius: int) -> Tuple[Tuple[int, int], ...]:
+        """Get the (dx, dz) chunk offsets within search_radius, computed once per radius"""
+        offsets = self._neighbor_offsets_cache.get(search_radius)
+        if offsets is None:
+            offsets = tuple(
+                (dx, dz)
+                for dx in range(-search_radius, search_radius + 1)
+                for dz in range(-search_radius, search_radius + 1)
+            )
+            self._neighbor_offsets_cache[search_radius] = offsets
+        return offsets
+
     def _add_to_chunk(self, chunk_id: Tuple[int, int], entity_id: int, chunk_dict: dict):
         """Add entity to chunk"""
         if chunk_id not in chunk_dict:
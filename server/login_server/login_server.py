@@ -12,7 +12,7 @@ from shared.constants import (
 )
 from shared.utils import Logger, validate_username, validate_password, validate_character_name
 from server.network.protocol import (
-    Packet, PacketBuffer, create_login_response, create_register_response,
+    Packet, read_packet, create_login_response, create_register_response,
     create_character_list_response, create_character_create_response,
     create_character_select_response, create_error_packet
 )
@@ -28,7 +28,6 @@ class ClientConnection:
         self.reader = reader
         self.writer = writer
         self.address = address
-        self.buffer = PacketBuffer()
         self.session_token: Optional[str] = None
         self.account_id: Optional[int] = None
 
@@ -42,22 +41,16 @@ class ClientConnection:
             logger.error(f"Failed to send packet to {self.address}: {e}")
 
     async def receive_packet(self) -> Optional[Packet]:
-        """Receive a packet from the client"""
-        try:
-            data = await self.reader.read(4096)
-            if not data:
-                return None
-
-            self.buffer.add_data(data)
-
-            if self.buffer.has_complete_packet():
-                return self.buffer.get_packet()
+        """
+        Receive the next packet from the client
 
-            return None
+        Returns:
+            Packet or None if it could not be decoded
 
-        except Exception as e:
-            logger.error(f"Failed to receive packet from {self.address}: {e}")
-            return None
+        Raises:
+            asyncio.IncompleteReadError: if the client disconnected
+        """
+        return await read_packet(self.reader)
 
     def close(self):
         """Close the connection"""
@@ -132,14 +125,14 @@ class LoginServer:
                 packet = await client.receive_packet()
 
                 if packet is None:
-                    # Check if connection is closed
-                    if reader.at_eof():
-                        break
                     continue
 
                 # Handle packet
                 await self.handle_packet(client, packet)
 
+        except asyncio.IncompleteReadError:
+            pass
+
         except Exception as e:
             logger.error(f"Error handling client {address}: {e}")
 
@@ -3,14 +3,30 @@ Subjugate Online - Network Protocol
 Binary protocol using MessagePack for efficient serialization
 """
 
+import asyncio
 import msgpack
 import struct
+import threading
 from typing import Dict, Any, Optional
 from shared.constants import PacketType, MAX_PACKET_SIZE
 from shared.utils import Logger
 
 logger = Logger.get_logger(__name__)
 
+_thread_local = threading.local()
+
+# Length prefix + packet type
+_HEADER = struct.Struct('!II')
+
+
+def _get_packer() -> msgpack.Packer:
+    """Get the calling thread's MessagePack packer"""
+    packer = getattr(_thread_local, 'packer', None)
+    if packer is None:
+        packer = msgpack.Packer(use_bin_type=True)
+        _thread_local.packer = packer
+    return packer
+
 
 class Packet:
     """Base packet class"""
@@ -18,35 +34,37 @@ class Packet:
     def __init__(self, packet_type: int, data: Optional[Dict[str, Any]] = None):
         self.packet_type = packet_type
         self.data = data or {}
+        self._serialized: Optional[bytes] = None
 
     def serialize(self) -> bytes:
         """
         Serialize packet to bytes
 
         Format: [4 bytes: length][4 bytes: type][N bytes: msgpack data]
-        """
-        # Pack data with MessagePack
-        packed_data = msgpack.packb(self.data, use_bin_type=True)
 
-        # Create header: packet type (4 bytes)
-        header = struct.pack('!I', self.packet_type)
+        The result is cached so a packet broadcast to many clients is only
+        packed once; don't modify data after the packet has been sent.
+        """
+        if self._serialized is not None:
+            return self._serialized
 
-        # Full packet: header + data
-        packet = header + packed_data
+        # Pack data with MessagePack, reusing the thread's packer
+        packed_data = _get_packer().pack(self.data)
 
-        # Prefix with length (4 bytes)
-        length = len(packet)
+        # Length covers the packet type (4 bytes) + data
+        length = 4 + len(packed_data)
         if length > MAX_PACKET_SIZE:
             raise ValueError(f"Packet size {length} exceeds maximum {MAX_PACKET_SIZE}")
 
-        final_packet = struct.pack('!I', length) + packet
+        final_packet = _HEADER.pack(length, self.packet_type) + packed_data
+        self._serialized = final_packet
 
         return final_packet
 
     @staticmethod
     def deserialize(data: bytes) -> Optional['Packet']:
         """
-        Deserialize bytes to packet
+        Deserialize bytes (or any buffer, e.g. a memoryview) to packet
 
         Returns:
             Packet object or None if invalid
@@ -56,7 +74,7 @@ class Packet:
             if len(data) < 4:
                 return None
 
-            packet_type = struct.unpack('!I', data[:4])[0]
+            packet_type = struct.unpack_from('!I', data)[0]
 
             # Read msgpack data (remaining bytes)
             if len(data) > 4:
@@ -98,22 +116,22 @@ class PacketBuffer:
 
         # Read expected length if not yet known
         if self.expected_length is None:
-            self.expected_length = struct.unpack('!I', self.buffer[:4])[0]
+            self.expected_length = struct.unpack_from('!I', self.buffer)[0]
 
         # Check if we have the complete packet (4 bytes length header + packet data)
         total_length = 4 + self.expected_length
         if len(self.buffer) < total_length:
             return None
 
-        # Extract packet data (skip the 4-byte length header)
-        packet_data = bytes(self.buffer[4:total_length])
+        # Deserialize straight from the buffer (skip the 4-byte length header)
+        with memoryview(self.buffer) as view, view[4:total_length] as packet_data:
+            packet = Packet.deserialize(packet_data)
 
         # Remove processed data from buffer
-        self.buffer = self.buffer[total_length:]
+        del self.buffer[:total_length]
         self.expected_length = None
 
-        # Deserialize and return packet
-        return Packet.deserialize(packet_data)
+        return packet
 
     def has_complete_packet(self) -> bool:
         """Check if buffer contains a complete packet"""
@@ -121,11 +139,33 @@ class PacketBuffer:
             return False
 
         if self.expected_length is None:
-            self.expected_length = struct.unpack('!I', self.buffer[:4])[0]
+            self.expected_length = struct.unpack_from('!I', self.buffer)[0]
 
         return len(self.buffer) >= (4 + self.expected_length)
 
 
+async def read_packet(reader: asyncio.StreamReader) -> Optional[Packet]:
+    """
+    Read one complete packet from a stream
+
+    Reads the length header, then exactly that many bytes, so the caller
+    wakes up once per packet no matter how it was split across reads.
+
+    Returns:
+        Packet or None if the packet could not be decoded
+
+    Raises:
+        asyncio.IncompleteReadError: if the stream closes
+        ValueError: if the length header exceeds MAX_PACKET_SIZE
+    """
+    header = await reader.readexactly(4)
+    length = struct.unpack('!I', header)[0]
+    if length > MAX_PACKET_SIZE:
+        raise ValueError(f"Packet size {length} exceeds maximum {MAX_PACKET_SIZE}")
+
+    return Packet.deserialize(await reader.readexactly(length))
+
+
 # ============================================================================
 # PACKET BUILDERS - Helper functions to create common packets
 # ============================================================================
@@ -11,6 +11,9 @@ LOGIN_SERVER_PORT = 5000
 GAME_SERVER_HOST = "127.0.0.1"
 GAME_SERVER_PORT = 5001
 MAX_PACKET_SIZE = 65535
+SEND_QUEUE_SIZE = 256  # Outbound packets buffered per client before it is dropped
+WRITE_BUFFER_HIGH_WATER = 256 * 1024  # Bytes buffered in a client transport before waiting on it
+WRITE_BUFFER_LOW_WATER = 64 * 1024
 TICK_RATE = 20  # Server updates per second
 NETWORK_UPDATE_RATE = 10  # Network sync rate per second
 
@@ -64,6 +67,7 @@ class DamageType:
 # ============================================================================
 REINCARNATION_LEVEL_REQUIREMENT = 100  # Min level to reincarnate
 MAX_REINCARNATIONS = 10
+REINCARNATION_PREVIEW_TTL = 5.0  # Seconds a reincarnation preview is reused
 
 # Success metrics for perk calculation
 class SuccessMetrics:
@@ -148,6 +152,12 @@ class NPCType:
     VENDOR = 2
     QUEST_GIVER = 3
 
+class NPCState:
+    IDLE = 0
+    PATROLLING = 1
+    CHASING = 2
+    ATTACKING = 3
+
 # Monster difficulty scaling
 MONSTER_HP_SCALE = 1.5
 MONSTER_DAMAGE_SCALE = 1.2
@@ -328,6 +338,8 @@ class ErrorCode:
 # ============================================================================
 DB_PATH = "data/subjugate_online.db"
 SESSION_EXPIRY = 3600  # 1 hour
+GUILD_FLUSH_INTERVAL = 2.0  # Seconds between batched guild saves
+TERRITORY_FLUSH_INTERVAL = 2.0  # Seconds between batched territory saves
 
 # ============================================================================
 # LOGGING
@@ -44,6 +44,14 @@ def calculate_distance(pos1: Tuple[float, float, float],
     dz = pos1[2] - pos2[2]
     return math.sqrt(dx*dx + dy*dy + dz*dz)
 
+def calculate_distance_sq(pos1: Tuple[float, float, float],
+                          pos2: Tuple[float, float, float]) -> float:
+    """Calculate squared 3D distance, for range checks that don't need the sqrt"""
+    dx = pos1[0] - pos2[0]
+    dy = pos1[1] - pos2[1]
+    dz = pos1[2] - pos2[2]
+    return dx*dx + dy*dy + dz*dz
+
 def calculate_distance_2d(pos1: Tuple[float, float],
                           pos2: Tuple[float, float]) -> float:
     """Calculate 2D distance (ignoring height)"""